@@ -0,0 +1,125 @@
+import sys
+import json
+import argparse
+from itertools import islice
+
+from linsys import LinearSystem
+
+
+# Solve many systems in one warm process:
+#
+#   python -m batch < systems.jsonl > results.jsonl
+#   python -m batch --input systems.jsonl --output results.jsonl --workers 4
+#
+# Every input line is one system, either a JSON list of equations
+# [[a_1, ..., a_n, k], ...] or an object
+# {"id": ..., "equations": [...], "backend": "float", "sparse": true}.
+# Numbers can be JSON numbers or strings, strings keep every digit for the
+# Decimal and Fraction backends ("3/5" works for Fraction).
+#
+# Every output line is {"id": ..., "verdict": "unique" | "none" | "infinite"}
+# plus "solution" for a unique solution and "rref" with --rref, numbers are
+# written as strings. The id defaults to the line number. A line that can't
+# be read gives {"id": ..., "error": "..."} and the batch goes on.
+
+
+def parse_system(line, default_backend=None):
+    data = json.loads(line)
+    options = {}
+    if isinstance(data, dict):
+        options = data
+        data = data['equations']
+    if not data:
+        raise ValueError('A system needs at least one equation')
+
+    backend = options.get('backend', default_backend)
+    if options.get('sparse'):
+        from sparse import SparseLinearSystem
+        cls = SparseLinearSystem
+    else:
+        cls = LinearSystem
+    return options.get('id'), cls.from_rows([eq[:-1] for eq in data], [eq[-1] for eq in data],
+                                            backend=backend)
+
+
+def format_solution(eq_id, solution, with_rref=False, with_parametrization=False):
+    result = {'id': eq_id, 'verdict': solution.verdict}
+    if solution.point is not None:
+        result['solution'] = [str(x) for x in solution.point.coordinates]
+    if with_parametrization and solution.verdict == LinearSystem.INF_SOLUTIONS:
+        p = solution.rref.compute_parametrization(solution.rref)
+        result['parametrization'] = {
+            'basepoint': [str(x) for x in p.basepoint.coordinates],
+            'directions': [[str(x) for x in v.coordinates] for v in p.direction_vectors]}
+    if with_rref:
+        rows = solution.rref._dense_snapshot()._rows
+        result['rref'] = [[str(x) for x in row] for row in rows]
+    return result
+
+
+def run(lines, output, workers=1, batch_size=1000, backend=None, with_rref=False):
+    # returns how many lines could not be solved
+    errors = 0
+    line_number = 0
+    lines = iter(lines)
+    while True:
+        chunk = list(islice(lines, batch_size))
+        if not chunk:
+            break
+
+        # (id, system or None, error message) in input order
+        parsed = []
+        for line in chunk:
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                eq_id, system = parse_system(line, backend)
+                if eq_id is None:
+                    eq_id = line_number
+                parsed.append((eq_id, system, None))
+            except Exception as e:
+                parsed.append((line_number, None, str(e) or e.__class__.__name__))
+
+        systems = [system for eq_id, system, error in parsed if system is not None]
+        solutions = iter(LinearSystem.solve_many(systems, workers=workers))
+
+        for eq_id, system, error in parsed:
+            if system is None:
+                result = {'id': eq_id, 'error': error}
+                errors += 1
+            else:
+                result = format_solution(eq_id, next(solutions), with_rref)
+            output.write(json.dumps(result, sort_keys=True))
+            output.write('\n')
+        output.flush()
+    return errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Solve a batch of linear systems (JSON lines)')
+    parser.add_argument('--input', default=None, help='read the systems from here instead of stdin')
+    parser.add_argument('--output', default=None, help='write the results here instead of stdout')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='processes for LinearSystem.solve_many (default 1)')
+    parser.add_argument('--batch-size', type=int, default=1000,
+                        help='systems read and solved at a time')
+    parser.add_argument('--backend', default=None, choices=['float', 'decimal', 'fraction'],
+                        help='numeric backend for the systems that do not choose one')
+    parser.add_argument('--rref', action='store_true', help='include the rref in the results')
+    args = parser.parse_args(argv)
+
+    source = open(args.input) if args.input else sys.stdin
+    output = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        errors = run(source, output, args.workers, args.batch_size, args.backend, args.rref)
+    finally:
+        if args.input:
+            source.close()
+        if args.output:
+            output.close()
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,261 @@
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+
+from vector import Vector
+from line import Line
+from plane import Plane
+from hyperplane import Hyperplane
+from linsys import LinearSystem
+
+
+# Benchmarks for the hot paths of Vector, Line, Plane, Hyperplane and
+# LinearSystem.
+#
+#   python bench.py                          # run, print a table
+#   python bench.py --output new.json        # also write a JSON report
+#   python bench.py --baseline old.json      # compare, exit 1 on regression
+#
+# Every case is run `repeat` times, each time calling it `number` times
+# (number is picked so one run takes at least MIN_RUN_TIME), the report keeps
+# the best and the mean time per call. With --baseline, a case is a
+# regression when best / baseline best > --threshold.
+
+SIZES = {
+    'small': {
+        'vector_dims': [3, 50],
+        'system_shapes': [(3, 3), (10, 10)],
+    },
+    'full': {
+        'vector_dims': [3, 50, 500],
+        'system_shapes': [(3, 3), (4, 3), (10, 10), (30, 30), (60, 40)],
+    },
+    # the systems with hundreds of variables, slow (minutes) in Decimal,
+    # and Hyperplane systems in float64 at dimensions Decimal can't reach
+    'large': {
+        'vector_dims': [500, 5000],
+        'system_shapes': [(50, 50), (100, 100), (200, 200)],
+        'float_system_shapes': [(300, 300), (500, 500)],
+    },
+}
+
+MIN_RUN_TIME = 0.05
+SEED = 1234
+
+
+def _random_coordinates(rng, dimension):
+    # three decimal places, like the numbers used in the class
+    return ['{:.3f}'.format(rng.uniform(-10, 10)) for _ in range(dimension)]
+
+
+def _random_system(rng, num_equations, dimension, backend=None):
+    rows = [_random_coordinates(rng, dimension + 1) for _ in range(num_equations)]
+    if dimension == 3:
+        planes = [Plane(Vector(r[:-1], backend), r[-1]) for r in rows]
+    else:
+        planes = [Hyperplane(Vector(r[:-1], backend), r[-1]) for r in rows]
+    return LinearSystem(planes)
+
+
+class _NullWriter(object):
+
+    def write(self, s):
+        pass
+
+
+def _quiet(f):
+    # solve() prints its verdict, keep that out of the benchmark output
+    def run():
+        stdout = sys.stdout
+        sys.stdout = _NullWriter()
+        try:
+            f()
+        finally:
+            sys.stdout = stdout
+    return run
+
+
+def vector_cases(dimensions):
+    for d in dimensions:
+        rng = random.Random(SEED)
+        v = Vector(_random_coordinates(rng, d))
+        w = Vector(_random_coordinates(rng, d))
+        params = {'dimension': d}
+        yield 'Vector.dot', params, lambda v=v, w=w: v.dot(w)
+        # a new Vector every call, the magnitude and the unit vector are
+        # cached after the first one. Vector.__init__ is that extra cost
+        yield 'Vector.__init__', params, lambda v=v: Vector(v.coordinates)
+        yield 'Vector.normalized', params, lambda v=v: Vector(v.coordinates).normalized()
+        yield 'Vector.angle_with', params, \
+            lambda v=v, w=w: Vector(v.coordinates).angle_with(Vector(w.coordinates))
+
+
+def line_cases():
+    rng = random.Random(SEED)
+    l1 = Line(Vector(_random_coordinates(rng, 2)), '1.5')
+    l2 = Line(Vector(_random_coordinates(rng, 2)), '-2.25')
+    l3 = Line(l1.normal_vector.times_scalar(3), l1.constant_term * 3)
+    yield 'Line.intersection_with', {'case': 'crossing'}, lambda: l1.intersection_with(l2)
+    yield 'Line.intersection_with', {'case': 'coincident'}, lambda: l1.intersection_with(l3)
+
+
+def plane_cases():
+    rng = random.Random(SEED)
+    p1 = Plane(Vector(_random_coordinates(rng, 3)), '2.5')
+    p2 = Plane(Vector(_random_coordinates(rng, 3)), '-1.5')
+    p3 = Plane(p1.normal_vector.times_scalar(-2), p1.constant_term * -2)
+    yield 'Plane.__eq__', {'case': 'different'}, lambda: p1 == p2
+    yield 'Plane.__eq__', {'case': 'equal'}, lambda: p1 == p3
+
+
+def hyperplane_cases(dimensions):
+    for d in dimensions:
+        rng = random.Random(SEED)
+        h1 = Hyperplane(Vector(_random_coordinates(rng, d)), '2.5')
+        h2 = Hyperplane(h1.normal_vector.times_scalar(-2), h1.constant_term * -2)
+        params = {'dimension': d}
+        yield 'Hyperplane.__init__', params, lambda h1=h1: Hyperplane(h1.normal_vector, h1.constant_term)
+        yield 'Hyperplane.__eq__', params, lambda h1=h1, h2=h2: h1 == h2
+
+
+def system_cases(shapes):
+    for num_equations, dimension in shapes:
+        s = _random_system(random.Random(SEED), num_equations, dimension)
+        params = {'equations': num_equations, 'dimension': dimension}
+        yield 'LinearSystem.compute_triangular_form', params, s.compute_triangular_form
+        yield 'LinearSystem.compute_rref', params, s.compute_rref
+        yield 'LinearSystem.compute_solution', params, s.compute_solution
+        yield 'LinearSystem.compute_exact_solution', params, s.compute_exact_solution
+        yield 'LinearSystem.solve', params, _quiet(s.solve)
+
+
+def float_system_cases(shapes):
+    # only the float elimination, the exact solve of these takes far too long
+    for num_equations, dimension in shapes:
+        s = _random_system(random.Random(SEED), num_equations, dimension, 'float')
+        params = {'equations': num_equations, 'dimension': dimension, 'backend': 'float'}
+        yield 'LinearSystem.compute_triangular_form', params, s.compute_triangular_form
+        yield 'LinearSystem.compute_solution', params, s.compute_solution
+
+
+def all_cases(size):
+    sizes = SIZES[size]
+    for case in vector_cases(sizes['vector_dims']):
+        yield case
+    for case in line_cases():
+        yield case
+    for case in plane_cases():
+        yield case
+    for case in hyperplane_cases(sizes['vector_dims']):
+        yield case
+    for case in system_cases(sizes['system_shapes']):
+        yield case
+    for case in float_system_cases(sizes.get('float_system_shapes', [])):
+        yield case
+
+
+def case_key(name, params):
+    return '{}[{}]'.format(name, ','.join('{}={}'.format(k, params[k]) for k in sorted(params)))
+
+
+def measure(f, repeat):
+    # find a number of calls that takes at least MIN_RUN_TIME
+    number = 1
+    while True:
+        start = time.time()
+        for _ in range(number):
+            f()
+        elapsed = time.time() - start
+        if elapsed >= MIN_RUN_TIME:
+            break
+        number *= 10 if elapsed < MIN_RUN_TIME / 10 else 2
+
+    times = []
+    for _ in range(repeat):
+        start = time.time()
+        for _ in range(number):
+            f()
+        times.append((time.time() - start) / number)
+    return number, min(times), sum(times) / len(times)
+
+
+def run(size='small', repeat=5, name_filter=None):
+    results = []
+    for name, params, f in all_cases(size):
+        key = case_key(name, params)
+        if name_filter and name_filter not in key:
+            continue
+        number, best, mean = measure(f, repeat)
+        results.append({'key': key, 'name': name, 'params': params,
+                         'number': number, 'repeat': repeat,
+                         'best': best, 'mean': mean})
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'size': size,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+
+
+def compare(report, baseline, threshold):
+    # returns a list of (key, baseline best, new best, ratio, regressed)
+    old = dict((r['key'], r['best']) for r in baseline['results'])
+    rows = []
+    for r in report['results']:
+        if r['key'] not in old:
+            continue
+        ratio = r['best'] / old[r['key']]
+        rows.append((r['key'], old[r['key']], r['best'], ratio, ratio > threshold))
+    return rows
+
+
+def _format_time(seconds):
+    for unit, scale in (('s', 1.), ('ms', 1e3), ('us', 1e6)):
+        if seconds * scale >= 1:
+            return '{:.3f} {}'.format(seconds * scale, unit)
+    return '{:.3f} ns'.format(seconds * 1e9)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the linear algebra hot paths')
+    parser.add_argument('--size', choices=sorted(SIZES), default='small')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--filter', dest='name_filter', default=None,
+                        help='only run the cases whose key contains this')
+    parser.add_argument('--output', default=None, help='write the JSON report here')
+    parser.add_argument('--baseline', default=None, help='JSON report to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='slowdown ratio that counts as a regression')
+    args = parser.parse_args(argv)
+
+    report = run(args.size, args.repeat, args.name_filter)
+    for r in report['results']:
+        print '{:<70} {:>12}'.format(r['key'], _format_time(r['best']))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = 0
+        print
+        for key, old, new, ratio, regressed in compare(report, baseline, args.threshold):
+            print '{:<70} {:>12} {:>12} {:>7.2f}x{}'.format(
+                key, _format_time(old), _format_time(new), ratio,
+                '  REGRESSION' if regressed else '')
+            regressions += regressed
+        if regressions:
+            print '{} regression(s) above {}x'.format(regressions, args.threshold)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
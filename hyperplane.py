@@ -0,0 +1,146 @@
+from vector import Vector
+from numeric import get_backend
+
+
+class Hyperplane(object):
+
+    # a_1 x_1 + ... + a_n x_n = k in any dimension n. Line (n = 2) and
+    # Plane (n = 3) are this class with the dimension fixed
+
+    NO_NONZERO_ELTS_FOUND_MSG = 'No nonzero elements found'
+    EITHER_DIM_OR_NORMAL_VEC_MUST_BE_PROVIDED_MSG = 'Either the dimension of the hyperplane or the normal vector must be provided'
+    DIMENSION_NOT_EQUAL_MSG = 'The normal vector is not of the dimension of the hyperplane'
+
+    def __init__(self, normal_vector=None, constant_term=None, dimension=None, backend=None):
+        if not normal_vector and dimension is None:
+            raise Exception(self.EITHER_DIM_OR_NORMAL_VEC_MUST_BE_PROVIDED_MSG)
+        if dimension is None:
+            dimension = normal_vector.dimension
+        elif normal_vector and normal_vector.dimension != dimension:
+            raise Exception(self.DIMENSION_NOT_EQUAL_MSG)
+        self.dimension = dimension
+
+        # the backend is the one asked for, or else the normal vector's
+        if backend is None and normal_vector:
+            backend = normal_vector.backend
+        self.backend = get_backend(backend)
+
+        if not normal_vector:
+            all_zeros = ['0']*self.dimension
+            normal_vector = Vector(all_zeros, self.backend)
+        elif normal_vector.backend != self.backend:
+            normal_vector = Vector(normal_vector.coordinates, self.backend)
+        self.normal_vector = normal_vector
+
+        if not constant_term:
+            constant_term = '0'
+        self.constant_term = self.backend.convert(constant_term)
+
+        self.set_basepoint()
+
+    def is_parallel_to(self, ell):
+        return self.normal_vector.is_parallel_to(ell.normal_vector)
+
+    def __eq__(self, ell):
+        # if self and other all zero, check constant
+        # if self is zero and other not, or vise versa, not way equal
+        if self.normal_vector.is_zero():
+            if not ell.normal_vector.is_zero():
+                return False
+            else:
+                return self.backend.is_near_zero(self.constant_term - ell.constant_term)
+        elif ell.normal_vector.is_zero():
+            return False
+
+        # if they aren't parallel, then no way they are the same
+        if not self.is_parallel_to(ell):
+            return False
+
+        # if the same, then normal vector should orthogonal to itself.
+        # in here, self.basepoint.minus(ell.basepoint) is itself
+        return self.normal_vector.is_orthogonal_to(self.basepoint.minus(ell.basepoint))
+
+    def __ne__(self, ell):
+        return not self.__eq__(ell)
+
+
+    def set_basepoint(self):
+        try:
+            n = self.normal_vector.coordinates
+            c = self.constant_term
+            basepoint_coords = ['0']*self.dimension
+
+            initial_index = Hyperplane.first_nonzero_index(n, self.backend)
+            initial_coefficient = n[initial_index]
+
+            with self.backend.local():
+                basepoint_coords[initial_index] = c/initial_coefficient
+            self.basepoint = Vector(basepoint_coords, self.backend)
+
+        except Exception as e:
+            if str(e) == Hyperplane.NO_NONZERO_ELTS_FOUND_MSG:
+                self.basepoint = None
+            else:
+                raise e
+
+
+    def __str__(self):
+
+        num_decimal_places = 3
+
+        def write_coefficient(coefficient, is_initial_term=False):
+            coefficient = round(coefficient, num_decimal_places)
+            if coefficient % 1 == 0:
+                coefficient = int(coefficient)
+
+            output = ''
+
+            if coefficient < 0:
+                output += '-'
+            if coefficient > 0 and not is_initial_term:
+                output += '+'
+
+            if not is_initial_term:
+                output += ' '
+
+            if abs(coefficient) != 1:
+                output += '{}'.format(abs(coefficient))
+
+            return output
+
+        n = self.normal_vector.coordinates
+
+        try:
+            initial_index = Hyperplane.first_nonzero_index(n, self.backend)
+            terms = [write_coefficient(n[i], is_initial_term=(i==initial_index)) + 'x_{}'.format(i+1)
+                     for i in range(self.dimension) if round(n[i], num_decimal_places) != 0]
+            output = ' '.join(terms)
+
+        except Exception as e:
+            if str(e) == self.NO_NONZERO_ELTS_FOUND_MSG:
+                output = '0'
+            else:
+                raise e
+
+        constant = round(self.constant_term, num_decimal_places)
+        if constant % 1 == 0:
+            constant = int(constant)
+        output += ' = {}'.format(constant)
+
+        return output
+
+
+    @staticmethod
+    def first_nonzero_index(iterable, backend=None):
+        is_near_zero = get_backend(backend).is_near_zero
+        for k, item in enumerate(iterable):
+            if not is_near_zero(item):
+                return k
+        raise Exception(Hyperplane.NO_NONZERO_ELTS_FOUND_MSG)
+
+
+if __name__ == '__main__':
+    a = Hyperplane(Vector(['1', '2', '0', '-1', '3']), '4')
+    b = Hyperplane(Vector(['-2', '-4', '0', '2', '-6']), '-8')
+    print a
+    print a.is_parallel_to(b), '  ', a == b
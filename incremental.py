@@ -0,0 +1,190 @@
+from linsys import LinearSystem, Solution
+from vector import Vector
+from numeric import get_backend
+
+
+class IncrementalLinearSystem(object):
+
+    # A linear system that keeps its reduced row echelon form up to date while
+    # equations are added, removed or replaced, instead of running
+    # compute_rref() again on every change.
+    #
+    # Every reduced row is stored with its combination, a dict
+    # {equation id: coefficient} saying which sum of the original equations
+    # it is (R = T A, T is the factorization that is kept). Rows with a pivot
+    # are kept in _pivot_rows by pivot column, rows whose coefficients all
+    # vanished (0 = k) in _dependent_rows. Adding an equation costs one
+    # reduction against the pivot rows, O(rank * n). Removing one uses a row
+    # whose combination contains it, preferably a 0 = k row since dropping
+    # that one leaves the reduced form as it is.
+
+    def __init__(self, dimension, backend=None):
+        self.dimension = dimension
+        self.backend = get_backend(backend)
+        self._equations = {}
+        self._next_id = 0
+        self._pivot_rows = {}
+        self._dependent_rows = []
+
+    @classmethod
+    def from_system(cls, system):
+        incremental = cls(system.dimension, system.backend)
+        for row in system._dense_snapshot()._rows:
+            incremental.add_row(row[:-1], row[-1])
+        return incremental
+
+    def add_equation(self, plane):
+        # returns the id used to remove or replace the equation later
+        return self.add_row(plane.normal_vector.coordinates, plane.constant_term)
+
+    def add_row(self, coefficients, constant_term):
+        eq_id = self._next_id
+        self._next_id += 1
+        self._insert_equation(eq_id, coefficients, constant_term)
+        return eq_id
+
+    def remove_equation(self, eq_id):
+        if eq_id not in self._equations:
+            raise KeyError('No equation with id {}'.format(eq_id))
+        del self._equations[eq_id]
+
+        # a 0 = k row that uses the equation, else a pivot row that does
+        holder = None
+        for entry in self._dependent_rows:
+            if eq_id in entry[1]:
+                holder = entry
+                break
+        is_pivot = holder is None
+        if is_pivot:
+            for j, entry in self._pivot_rows.items():
+                if eq_id in entry[1]:
+                    holder = entry
+                    del self._pivot_rows[j]
+                    break
+        else:
+            self._dependent_rows.remove(holder)
+
+        if holder is None:
+            # everything it contributed rounded away, nothing to undo
+            return
+
+        # take the equation out of every other row with a multiple of holder
+        with self.backend.local():
+            affected = []
+            c = holder[1][eq_id]
+            for entry in self._pivot_rows.values() + self._dependent_rows:
+                f = entry[1].get(eq_id)
+                if f is None:
+                    continue
+                self._subtract(entry, holder, f/c)
+                entry[1].pop(eq_id, None)
+                affected.append(entry)
+
+            if is_pivot:
+                # the pivot column of holder is free now and the rows that got
+                # a multiple of holder may not start at their own pivot anymore,
+                # reduce them again
+                for entry in affected:
+                    for j, e in self._pivot_rows.items():
+                        if e is entry:
+                            del self._pivot_rows[j]
+                            break
+                for entry in affected:
+                    self._insert(entry)
+
+    def replace_equation(self, eq_id, plane):
+        self.remove_equation(eq_id)
+        self._insert_equation(eq_id, plane.normal_vector.coordinates, plane.constant_term)
+        return eq_id
+
+    def _insert_equation(self, eq_id, coefficients, constant_term):
+        convert = self.backend.convert
+        row = [convert(x) for x in coefficients]
+        if len(row) != self.dimension:
+            raise Exception(LinearSystem.ALL_PLANES_MUST_BE_IN_SAME_DIM_MSG)
+        row.append(convert(constant_term))
+        self._equations[eq_id] = row
+        with self.backend.local():
+            self._insert([list(row), {eq_id: self.backend.one}])
+
+    def _subtract(self, entry, other, f):
+        # entry -= f * other, both the row and the combination
+        row, combination = entry
+        other_row, other_combination = other
+        is_near_zero = self.backend.is_near_zero
+        for k in range(len(row)):
+            if other_row[k] != 0:
+                row[k] = row[k] - f*other_row[k]
+        for eq_id, x in other_combination.items():
+            v = combination.get(eq_id, self.backend.zero) - f*x
+            if is_near_zero(v):
+                combination.pop(eq_id, None)
+            else:
+                combination[eq_id] = v
+
+    def _insert(self, entry):
+        row = entry[0]
+        zero = self.backend.zero
+        is_near_zero = self.backend.is_near_zero
+
+        # reduce against the pivot rows we already have
+        for j, pivot_entry in self._pivot_rows.items():
+            if row[j] != 0:
+                self._subtract(entry, pivot_entry, row[j])
+                row[j] = zero
+
+        for j in range(self.dimension):
+            if not is_near_zero(row[j]):
+                break
+        else:
+            # no pivot left, 0 = k
+            for k in range(self.dimension):
+                row[k] = zero
+            self._dependent_rows.append(entry)
+            return
+
+        # make the new pivot 1 and clear its column in the other pivot rows
+        coe = self.backend.one/row[j]
+        for k in range(len(row)):
+            row[k] = row[k]*coe
+        for eq_id in entry[1]:
+            entry[1][eq_id] = entry[1][eq_id]*coe
+        row[j] = self.backend.one
+
+        for pivot_entry in self._pivot_rows.values():
+            f = pivot_entry[0][j]
+            if f != 0:
+                self._subtract(pivot_entry, entry, f)
+                pivot_entry[0][j] = zero
+        self._pivot_rows[j] = entry
+
+    def __len__(self):
+        return len(self._equations)
+
+    def rank(self):
+        return len(self._pivot_rows)
+
+    def is_consistent(self):
+        for row, combination in self._dependent_rows:
+            if not self.backend.is_near_zero(row[-1]):
+                return False
+        return True
+
+    def compute_rref(self):
+        rows = [list(self._pivot_rows[j][0]) for j in sorted(self._pivot_rows)]
+        rows += [list(row) for row, combination in self._dependent_rows]
+        return LinearSystem._from_rows(rows, self.dimension, self.backend)
+
+    def compute_solution(self):
+        rref = self.compute_rref()
+        if not self.is_consistent():
+            return Solution(LinearSystem.NO_SOLUTIONS, rref)
+        if self.rank() < self.dimension:
+            return Solution(LinearSystem.INF_SOLUTIONS, rref)
+        point = Vector([self._pivot_rows[j][0][-1] for j in range(self.dimension)], self.backend)
+        return Solution(LinearSystem.UNIQUE_SOLUTION, rref, point)
+
+    def to_system(self):
+        # the current equations, in the order they were added
+        rows = [list(self._equations[eq_id]) for eq_id in sorted(self._equations)]
+        return LinearSystem._from_rows(rows, self.dimension, self.backend)
@@ -0,0 +1,229 @@
+from timeit import default_timer
+
+from vector import Vector
+from hyperplane import Hyperplane
+from linsys import LinearSystem
+
+
+# Opt-in instrumentation of the solver. Nothing in linsys.py knows about it:
+# while it is on, the LinearSystem methods (and those of the subclasses that
+# are imported at that time, e.g. SparseLinearSystem) are replaced by
+# wrappers that count and time, and the originals are put back when it is
+# off, so there is no cost at all when nobody is measuring.
+#
+#   with collect() as stats:            # everything inside goes to stats
+#       system.solve()
+#   print stats.as_dict()
+#
+#   enable(callback)                    # callback(stats) after every
+#   ...                                 # outermost solve/compute_* call
+#   disable()
+#
+# Timings are exclusive, e.g. 'rref' doesn't include the 'triangular_form'
+# it calls, so the phases of one call add up to its total time.
+
+# method name -> phase name
+PHASES = {
+    'solve': 'solve',
+    'compute_solution': 'classification',
+    'compute_rref': 'rref',
+    'compute_triangular_form': 'triangular_form',
+    'parametrization': 'parametrization',
+    'factorize': 'factorize',
+}
+
+# method name -> (counter name, how much to add given (args, result))
+COUNTERS = {
+    'swap_rows': ('row_swaps', None),
+    'add_multiple_times_row_to_row': ('row_additions', None),
+    'multiply_coefficient_and_row': ('row_multiplications', None),
+    '_eliminate': ('row_additions', lambda args, result: len(args[3])),
+    '_triangularize': ('pivots', lambda args, result: len(result)),
+    '_next_pivot': ('pivots', lambda args, result: 0 if result is None else 1),
+    'snapshot': ('snapshots', None),
+}
+
+
+class SolveStats(object):
+
+    def __init__(self):
+        self.counters = {}
+        self.timings = {}
+        self.calls = {}
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_time(self, phase, seconds):
+        self.timings[phase] = self.timings.get(phase, 0.) + seconds
+        self.calls[phase] = self.calls.get(phase, 0) + 1
+
+    def total_time(self):
+        return sum(self.timings.values())
+
+    def as_dict(self):
+        return {'counters': dict(self.counters),
+                'timings': dict(self.timings),
+                'calls': dict(self.calls)}
+
+    def __str__(self):
+        lines = ['Solve stats:']
+        for name in sorted(self.counters):
+            lines.append('  {:<22} {}'.format(name, self.counters[name]))
+        for phase in sorted(self.timings):
+            lines.append('  {:<22} {:.6f} s ({} calls)'.format(
+                phase, self.timings[phase], self.calls[phase]))
+        return '\n'.join(lines)
+
+
+_originals = {}
+_users = 0
+_collectors = []
+_callback = None
+_call_stats = None
+_depth = 0
+_child_times = []
+_counting = set()
+
+
+def _sinks():
+    if _call_stats is None:
+        return _collectors
+    return _collectors + [_call_stats]
+
+
+def _timed(phase, f):
+    def wrapper(*args, **kwargs):
+        global _depth, _call_stats
+        if _depth == 0 and _callback is not None:
+            _call_stats = SolveStats()
+        _depth += 1
+        _child_times.append(0.)
+        start = default_timer()
+        try:
+            return f(*args, **kwargs)
+        finally:
+            elapsed = default_timer() - start
+            children = _child_times.pop()
+            if _child_times:
+                _child_times[-1] += elapsed
+            for stats in _sinks():
+                stats.add_time(phase, elapsed - children)
+            _depth -= 1
+            if _depth == 0 and _call_stats is not None:
+                stats, _call_stats = _call_stats, None
+                _callback(stats)
+    wrapper.__name__ = f.__name__
+    return wrapper
+
+
+def _counted(counter, amount, f):
+    def wrapper(*args, **kwargs):
+        # a subclass method calling the base one is still one operation
+        if counter in _counting:
+            return f(*args, **kwargs)
+        _counting.add(counter)
+        try:
+            result = f(*args, **kwargs)
+        finally:
+            _counting.discard(counter)
+        n = 1 if amount is None else amount(args, result)
+        for stats in _sinks():
+            stats.count(counter, n)
+        return result
+    wrapper.__name__ = f.__name__
+    return wrapper
+
+
+def _counted_row_copy(f):
+    # _writable_row only copies the row when it is still shared
+    def wrapper(self, i):
+        if not self._owned[i]:
+            for stats in _sinks():
+                stats.count('row_copies')
+        return f(self, i)
+    wrapper.__name__ = f.__name__
+    return wrapper
+
+
+def _system_classes(cls=LinearSystem):
+    yield cls
+    for sub in cls.__subclasses__():
+        for c in _system_classes(sub):
+            yield c
+
+
+def _patch(cls, name, wrapper):
+    if name in cls.__dict__ and (cls, name) not in _originals:
+        original = cls.__dict__[name]
+        _originals[(cls, name)] = original
+        setattr(cls, name, wrapper(original))
+
+
+def _install():
+    global _users
+    _users += 1
+    if _users > 1:
+        return
+    for cls in _system_classes():
+        for name, phase in PHASES.items():
+            _patch(cls, name, lambda f, phase=phase: _timed(phase, f))
+        for name, (counter, amount) in COUNTERS.items():
+            _patch(cls, name, lambda f, counter=counter, amount=amount: _counted(counter, amount, f))
+        _patch(cls, '_writable_row', _counted_row_copy)
+    _patch(Hyperplane, '__init__', lambda f: _counted('planes_created', None, f))
+    _patch(Vector, '__init__', lambda f: _counted('vectors_created', None, f))
+
+
+def _uninstall():
+    global _users
+    _users -= 1
+    if _users > 0:
+        return
+    for (cls, name), original in _originals.items():
+        setattr(cls, name, original)
+    _originals.clear()
+
+
+class collect(object):
+
+    # context manager, the SolveStats it returns gets everything that
+    # happens inside the with block. callback(stats) is called at the end
+
+    def __init__(self, callback=None):
+        self.stats = SolveStats()
+        self.callback = callback
+
+    def __enter__(self):
+        _install()
+        _collectors.append(self.stats)
+        return self.stats
+
+    def __exit__(self, *args):
+        _collectors.remove(self.stats)
+        _uninstall()
+        if self.callback is not None:
+            self.callback(self.stats)
+        return False
+
+
+def enable(callback):
+    # callback(stats) gets a new SolveStats for every outermost solve(),
+    # compute_solution(), compute_rref() ... call until disable()
+    global _callback
+    if _callback is not None:
+        raise Exception('Instrumentation is already enabled')
+    _callback = callback
+    _install()
+
+
+def disable():
+    global _callback
+    if _callback is None:
+        return
+    _callback = None
+    _uninstall()
+
+
+def is_enabled():
+    return _users > 0
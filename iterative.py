@@ -0,0 +1,199 @@
+from math import sqrt
+
+from vector import Vector
+
+
+# Iterative solvers for big square systems, where the elimination of
+# compute_rref() costs O(n^3). The equations are read once into compressed
+# rows of floats (only the nonzero coefficients, so a SparseLinearSystem
+# stays sparse) and every iteration costs O(nnz):
+#
+#   jacobi               needs a diagonally dominant system to converge
+#   sor                  Gauss-Seidel for omega=1, over-relaxation above 1
+#   conjugate_gradient   for symmetric positive definite systems,
+#                        preconditioner='diagonal' divides by the diagonal
+#
+# x0 is the starting point (a Vector, a list or an earlier
+# IterativeSolution), zero by default. The iteration stops when
+# |b - A x| <= tol |b| (2-norms) or after max_iter iterations.
+# callback(iteration, x, residual) is called after every iteration with the
+# current x as a list of floats, returning True stops the iteration.
+
+METHODS = ('jacobi', 'gauss_seidel', 'sor', 'cg')
+
+
+class IterativeSolution(object):
+
+    # point is the last iterate (float backend), residual its |b - A x|,
+    # converged whether that is within the tolerance
+
+    def __init__(self, point, converged, iterations, residual):
+        self.point = point
+        self.converged = converged
+        self.iterations = iterations
+        self.residual = residual
+
+    def __str__(self):
+        return 'Iterative solution: {} after {} iterations, residual={} {}'.format(
+            'converged' if self.converged else 'not converged',
+            self.iterations, self.residual, self.point)
+
+
+class _CompressedRows(object):
+
+    # row i is the pairs (column, coefficient) of its nonzero coefficients,
+    # split into the diagonal and everything else
+
+    def __init__(self, system):
+        n = system.dimension
+        if len(system) != n:
+            raise Exception('Iterative solvers need a square system, got {} equations in {} variables'.format(
+                len(system), n))
+        self.n = n
+        self.off_diagonal = []
+        self.diagonal = []
+        self.constants = []
+        for i in range(n):
+            row = []
+            d = 0.
+            for j, x in system._row_items(i):
+                x = float(x)
+                if x == 0:
+                    continue
+                if j == i:
+                    d = x
+                else:
+                    row.append((j, x))
+            self.off_diagonal.append(row)
+            self.diagonal.append(d)
+            self.constants.append(float(system._rows[i][-1]))
+
+    def nonzero_diagonal(self):
+        if any(d == 0 for d in self.diagonal):
+            raise Exception('Zero coefficient on the diagonal, reorder the equations first')
+
+    def times(self, x):
+        return [d*xi + sum(a*x[j] for j, a in row)
+                for row, d, xi in zip(self.off_diagonal, self.diagonal, x)]
+
+    def residual(self, x):
+        return [b - ax for b, ax in zip(self.constants, self.times(x))]
+
+
+def _norm(v):
+    return sqrt(sum(x*x for x in v))
+
+
+def _start(x0, n):
+    if x0 is None:
+        return [0.] * n
+    if isinstance(x0, IterativeSolution):
+        x0 = x0.point
+    if isinstance(x0, Vector):
+        x0 = x0.coordinates
+    x = [float(xi) for xi in x0]
+    if len(x) != n:
+        raise ValueError('The starting point needs {} coordinates'.format(n))
+    return x
+
+
+def _finish(x, converged, iterations, residual):
+    return IterativeSolution(Vector(x, 'float'), converged, iterations, residual)
+
+
+def jacobi(system, x0=None, tol=1e-10, max_iter=1000, callback=None):
+    rows = _CompressedRows(system)
+    rows.nonzero_diagonal()
+    x = _start(x0, rows.n)
+    target = tol * (_norm(rows.constants) or 1.)
+
+    residual = _norm(rows.residual(x))
+    iteration = 0
+    while residual > target and iteration < max_iter:
+        x = [(b - sum(a*x[j] for j, a in row)) / d
+             for row, d, b in zip(rows.off_diagonal, rows.diagonal, rows.constants)]
+        iteration += 1
+        residual = _norm(rows.residual(x))
+        if callback is not None and callback(iteration, x, residual):
+            break
+    return _finish(x, residual <= target, iteration, residual)
+
+
+def sor(system, omega=1., x0=None, tol=1e-10, max_iter=1000, callback=None):
+    if not 0 < omega < 2:
+        raise ValueError('SOR only converges for 0 < omega < 2')
+    rows = _CompressedRows(system)
+    rows.nonzero_diagonal()
+    x = _start(x0, rows.n)
+    target = tol * (_norm(rows.constants) or 1.)
+    sweep = list(zip(range(rows.n), rows.off_diagonal, rows.diagonal, rows.constants))
+
+    residual = _norm(rows.residual(x))
+    iteration = 0
+    while residual > target and iteration < max_iter:
+        # x is updated in place, every row already sees the new values
+        for i, row, d, b in sweep:
+            gauss_seidel = (b - sum(a*x[j] for j, a in row)) / d
+            x[i] += omega * (gauss_seidel - x[i])
+        iteration += 1
+        residual = _norm(rows.residual(x))
+        if callback is not None and callback(iteration, list(x), residual):
+            break
+    return _finish(x, residual <= target, iteration, residual)
+
+
+def gauss_seidel(system, x0=None, tol=1e-10, max_iter=1000, callback=None):
+    return sor(system, 1., x0, tol, max_iter, callback)
+
+
+def conjugate_gradient(system, x0=None, tol=1e-10, max_iter=None, callback=None,
+                       preconditioner=None):
+    # in exact arithmetic CG is done after n iterations, max_iter defaults
+    # to a few times that for the rounding errors
+    if preconditioner not in (None, 'diagonal'):
+        raise ValueError('Unknown preconditioner: {}'.format(preconditioner))
+    rows = _CompressedRows(system)
+    if preconditioner == 'diagonal':
+        rows.nonzero_diagonal()
+        inverse = [1. / d for d in rows.diagonal]
+
+        def precondition(r):
+            return [m*ri for m, ri in zip(inverse, r)]
+    else:
+        def precondition(r):
+            return r
+
+    if max_iter is None:
+        max_iter = 10 * rows.n
+    x = _start(x0, rows.n)
+    target = tol * (_norm(rows.constants) or 1.)
+
+    r = rows.residual(x)
+    z = precondition(r)
+    p = list(z)
+    rz = sum(a*b for a, b in zip(r, z))
+    residual = _norm(r)
+    iteration = 0
+    while residual > target and iteration < max_iter:
+        q = rows.times(p)
+        pq = sum(a*b for a, b in zip(p, q))
+        if pq <= 0:
+            # A is not positive definite (or p vanished), no step to take
+            break
+        alpha = rz / pq
+        x = [xi + alpha*pi for xi, pi in zip(x, p)]
+        r = [ri - alpha*qi for ri, qi in zip(r, q)]
+        iteration += 1
+        residual = _norm(r)
+        if callback is not None and callback(iteration, x, residual):
+            break
+        if residual <= target:
+            break
+        z = precondition(r)
+        rz, previous = sum(a*b for a, b in zip(r, z)), rz
+        beta = rz / previous
+        p = [zi + beta*pi for zi, pi in zip(z, p)]
+
+    # the recurrence drifts away from the true residual, report that one
+    residual = _norm(rows.residual(x))
+    return _finish(x, residual <= target, iteration, residual)
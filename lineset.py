@@ -0,0 +1,131 @@
+import numpy as np
+
+from vector import Vector
+from line import Line
+from numeric import FloatBackend
+
+
+# status of a pair of lines, the three outcomes of Line.intersection_with:
+# a point, None (parallel) or the line itself (the same line)
+INTERSECTING = 0
+PARALLEL = 1
+COINCIDENT = 2
+
+
+class IntersectionChunk(object):
+
+    # one block of pairs: first[k] < second[k] are line indices, status[k]
+    # one of INTERSECTING / PARALLEL / COINCIDENT and points[k] the
+    # intersection point (nan, nan) when there is none
+
+    def __init__(self, first, second, status, points):
+        self.first = first
+        self.second = second
+        self.status = status
+        self.points = points
+
+    def __len__(self):
+        return len(self.first)
+
+
+class LineArray(object):
+
+    # N lines a_1 x_1 + a_2 x_2 = k packed as an N x 2 float64 array of normal
+    # vectors and an array of N constant terms, so the intersections of all
+    # pairs can be computed with vectorized 2x2 determinants instead of one
+    # Line.intersection_with at a time
+
+    def __init__(self, normals, constants, eps=FloatBackend.eps):
+        self.normals = np.ascontiguousarray(normals, dtype=np.float64).reshape(-1, 2)
+        self.constants = np.ascontiguousarray(constants, dtype=np.float64).reshape(-1)
+        if len(self.normals) != len(self.constants):
+            raise ValueError('Need one constant term per line')
+        self.eps = eps
+        self._basepoints = None
+
+    @classmethod
+    def from_lines(cls, lines, eps=FloatBackend.eps):
+        lines = list(lines)
+        normals = np.array([[float(x) for x in ell.normal_vector.coordinates] for ell in lines])
+        constants = np.array([float(ell.constant_term) for ell in lines])
+        return cls(normals, constants, eps)
+
+    def to_lines(self, backend='float'):
+        return [Line(Vector(n, backend), k, backend)
+                for n, k in zip(self.normals.tolist(), self.constants.tolist())]
+
+    def __len__(self):
+        return len(self.constants)
+
+    def basepoints(self):
+        # same as Line.set_basepoint: k / a_i on the first nonzero a_i,
+        # (nan, nan) for a line with a zero normal vector
+        if self._basepoints is None:
+            nonzero = np.abs(self.normals) >= self.eps
+            first = np.where(nonzero[:, 0], 0, 1)
+            rows = np.arange(len(self))
+            base = np.zeros((len(self), 2))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                base[rows, first] = self.constants / self.normals[rows, first]
+            base[~nonzero.any(axis=1)] = np.nan
+            self._basepoints = base
+        return self._basepoints
+
+    def _classify(self, i, j):
+        # intersect line i[k] with line j[k] for every k
+        a = self.normals[i]
+        b = self.normals[j]
+        k1 = self.constants[i]
+        k2 = self.constants[j]
+        det = a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0]
+        parallel = np.abs(det) < self.eps
+
+        points = np.empty((len(i), 2))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            points[:, 0] = (b[:, 1] * k1 - a[:, 1] * k2) / det
+            points[:, 1] = (a[:, 0] * k2 - b[:, 0] * k1) / det
+        points[parallel] = np.nan
+
+        # parallel lines are the same line when the base point of one lies on
+        # the other (Line.__eq__), two zero normal vectors need equal constants
+        zero_a = ~(np.abs(a) >= self.eps).any(axis=1)
+        zero_b = ~(np.abs(b) >= self.eps).any(axis=1)
+        base_b = self.basepoints()[j]
+        with np.errstate(invalid='ignore'):
+            on_line = np.abs(a[:, 0] * base_b[:, 0] + a[:, 1] * base_b[:, 1] - k1) < self.eps
+        same = np.where(zero_a | zero_b,
+                        zero_a & zero_b & (np.abs(k1 - k2) < self.eps),
+                        on_line)
+
+        status = np.full(len(i), INTERSECTING, dtype=np.int8)
+        status[parallel] = PARALLEL
+        status[parallel & same] = COINCIDENT
+        return status, points
+
+    def intersections(self, chunk_size=1 << 20, include_parallel=True):
+        # yield IntersectionChunk objects covering every pair i < j, about
+        # chunk_size pairs at a time, so the n^2 results never all exist at once
+        n = len(self)
+        block = max(1, chunk_size // max(n, 1))
+        for start in range(0, n - 1, block):
+            stop = min(n - 1, start + block)
+            rows = np.arange(start, stop)
+            cols = np.arange(start + 1, n)
+            mask = cols[None, :] > rows[:, None]
+            r, c = np.nonzero(mask)
+            i = rows[r]
+            j = cols[c]
+            status, points = self._classify(i, j)
+            if not include_parallel:
+                keep = status == INTERSECTING
+                i, j, status, points = i[keep], j[keep], status[keep], points[keep]
+            yield IntersectionChunk(i, j, status, points)
+
+    def count_intersections(self, chunk_size=1 << 20):
+        # number of pairs for each status, without keeping any of the points
+        counts = np.zeros(3, dtype=np.int64)
+        for chunk in self.intersections(chunk_size):
+            counts += np.bincount(chunk.status, minlength=3)
+        return {'intersecting': int(counts[INTERSECTING]),
+                'parallel': int(counts[PARALLEL]),
+                'coincident': int(counts[COINCIDENT])}
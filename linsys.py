@@ -1,10 +1,14 @@
-from decimal import Decimal, getcontext
-from copy import deepcopy
+from fractions import Fraction, gcd
+from math import ceil
 
 from vector import Vector
 from plane import Plane
+from hyperplane import Hyperplane
+from numeric import get_backend, FloatBackend
 
-getcontext().prec = 30
+
+# solve_many() doesn't start a process pool for less systems than this
+SOLVE_MANY_SERIAL_THRESHOLD = 64
 
 
 class LinearSystem(object):
@@ -13,57 +17,264 @@ class LinearSystem(object):
     NO_SOLUTIONS_MSG = 'No solutions'
     INF_SOLUTIONS_MSG = 'Infinitely many solutions'
 
-    def __init__(self, planes):
+    # verdicts of compute_solution()
+    UNIQUE_SOLUTION = 'unique'
+    NO_SOLUTIONS = 'none'
+    INF_SOLUTIONS = 'infinite'
+
+    def __init__(self, planes, backend=None):
         try:
             d = planes[0].dimension
             for p in planes:
                 assert p.dimension == d
 
-            self.planes = planes
             self.dimension = d
 
         except AssertionError:
             raise Exception(self.ALL_PLANES_MUST_BE_IN_SAME_DIM_MSG)
+
+        # the numeric backend of the whole system, by default the first plane's.
+        # planes in another backend are converted when they are added
+        if backend is None:
+            backend = planes[0].backend
+        self.backend = get_backend(backend)
+
+        # the system is stored as an augmented matrix, one row per equation
+        # [a_1, ..., a_n, k]. Row operations update these lists in place,
+        # Plane objects are only built (and cached) when someone asks for them
+        self.planes = planes
+
+    @classmethod
+    def from_rows(cls, rows, constants, dimension=None, backend=None):
+        # build a system from the coefficients of each equation and the
+        # constant terms, without building Plane / Hyperplane objects
+        backend = get_backend(backend)
+        convert = backend.convert
+        if dimension is None:
+            dimension = len(rows[0])
+        augmented = []
+        for row, k in zip(rows, constants):
+            if len(row) != dimension:
+                raise Exception(cls.ALL_PLANES_MUST_BE_IN_SAME_DIM_MSG)
+            r = [convert(x) for x in row]
+            r.append(convert(k))
+            augmented.append(r)
+        return cls._from_rows(augmented, dimension, backend)
+
+    @classmethod
+    def _from_rows(cls, rows, dimension, backend=None):
+        # build a system directly on top of an augmented matrix, no Plane needed
+        system = cls.__new__(cls)
+        system.dimension = dimension
+        system.backend = get_backend(backend)
+        system._rows = rows
+        system._planes = [None] * len(rows)
+        system._owned = [True] * len(rows)
+        system._factorization = None
+        return system
+
+    def snapshot(self):
+        # cheap copy of the system: both systems share the same row lists and
+        # a row is only copied by the one that modifies it first (copy on write)
+        system = self.__class__.__new__(self.__class__)
+        system.dimension = self.dimension
+        system.backend = self.backend
+        system._rows = list(self._rows)
+        system._planes = list(self._planes)
+        system._owned = [False] * len(self._rows)
+        system._factorization = None
+        self._owned = [False] * len(self._rows)
+        return system
+
+    def _writable_row(self, i):
+        self._factorization = None
+        if not self._owned[i]:
+            self._rows[i] = list(self._rows[i])
+            self._owned[i] = True
+        self._planes[i] = None
+        return self._rows[i]
+
+    def _row_from_plane(self, p):
+        row = list(p.normal_vector.coordinates)
+        row.append(p.constant_term)
+        if p.backend != self.backend:
+            row = [self.backend.convert(x) for x in row]
+        return row
+
+    # the equations as a tuple, built on every access: changing it would not
+    # change the system, so it can't be changed. Use system[i] = p, or assign
+    # a whole new list to planes
+    @property
+    def planes(self):
+        return tuple([self[i] for i in range(len(self))])
+
+    @planes.setter
+    def planes(self, planes):
+        self._rows = [self._row_from_plane(p) for p in planes]
+        self._planes = [p if p.backend == self.backend else None for p in planes]
+        self._owned = [True] * len(planes)
+        self._factorization = None
             
-    def solve(self):
-        rref= self.compute_rref()
-            
-        # no solution, 0=k, infinite solution, 0=0 for pivot
-        
-        # if there's 0=k in any equation, print no solution, return rref
-        for i in range(len(self)):
-            if rref[i].normal_vector.is_zero() and (rref[i].constant_term != 0):
-                print self.NO_SOLUTIONS_MSG
-                return rref
-            
-        
-        # if variables > number of equations, then print infinite solutions, return rref
-        if self.dimension > len(self):
+    def solve(self, in_place=False, presolve=False):
+        # in_place=True reduces this system itself instead of a snapshot,
+        # it saves the copy but the system is left in rref afterwards
+        result= self.compute_solution(in_place, presolve)
+
+        if result.verdict == self.NO_SOLUTIONS:
+            print self.NO_SOLUTIONS_MSG
+        elif result.verdict == self.INF_SOLUTIONS:
             print self.INF_SOLUTIONS_MSG
-            self.parametrization(rref)
-            return rref
+            self.parametrization(result.rref)
+        else:
+            print 'one solution'
+        return result.rref
+
+    def compute_solution(self, in_place=False, presolve=False):
+        # same as solve(), but nothing is printed, the verdict comes back
+        # in a Solution together with the rref (and the point if unique).
+        # presolve=True first drops the 0=0 rows and repeated equations,
+        # see presolve(), the report is kept in Solution.presolve_report
+        if presolve:
+            reduced, report= self.presolve()
+            if report.inconsistent is not None:
+                # 0 = k already found, the verdict doesn't need the
+                # elimination but Solution.rref is still the rref
+                result= Solution(self.NO_SOLUTIONS, reduced.compute_rref(in_place=True))
+            else:
+                result= reduced.compute_solution(in_place=True)
+            result.presolve_report= report
+            return result
 
-        # if there's 0=0 in any pivot equation, print infinite solution, return rref        
-        for i in range(self.dimension):
-            if rref[i].normal_vector.is_zero() and (rref[i].constant_term == 0):
-                print self.INF_SOLUTIONS_MSG
-                self.parametrization(rref)
-                return rref
-            
-        print 'one solution'
-        return rref
+        rref= self.compute_rref(in_place)
+
+        # no solution, 0=k, infinite solution, 0=0 for pivot
+
+        # if there's 0=k in any equation, no solution
+        for i in range(len(rref)):
+            if rref._is_zero_row(i) and not self.backend.is_near_zero(rref._rows[i][-1]):
+                return Solution(self.NO_SOLUTIONS, rref)
+
+        # less pivots than variables (this includes the case variables > number
+        # of equations, or 0=0 in a pivot equation), infinite solutions
+        pivots= [j for j in rref._pivot_columns() if j != -1]
+        if len(pivots) < self.dimension:
+            return Solution(self.INF_SOLUTIONS, rref)
+
+        point= Vector([rref._rows[i][-1] for i in range(self.dimension)], self.backend)
+        return Solution(self.UNIQUE_SOLUTION, rref, point)
+
+    def presolve(self):
+        # cheap pass before the elimination: every equation is divided by its
+        # first nonzero coefficient (same direction and sign for all multiples
+        # of it) and put in a dict by these coefficients, so equal equations
+        # are found in about linear time instead of comparing every pair.
+        # 0=0 rows and equations equal to an earlier one (same plane, like
+        # Plane.__eq__) are dropped, the same direction with another constant
+        # term or a 0=k row means no solutions. Returns the smaller system
+        # (sharing rows with this one) and a PresolveReport
+        report= PresolveReport(len(self))
+        is_near_zero= self.backend.is_near_zero
+        buckets= {}
+
+        with self.backend.local():
+            for i in range(len(self)):
+                items= [(j, x) for j, x in self._row_items(i) if not is_near_zero(x)]
+                k= self._rows[i][-1]
+
+                if not items:
+                    if is_near_zero(k):
+                        report.zero_rows.append(i)
+                        continue
+                    # 0 = k
+                    if report.inconsistent is None:
+                        report.inconsistent= (i, i)
+                    report.kept.append(i)
+                    continue
+
+                lead= items[0][1]
+                direction= [(j, x/lead) for j, x in items]
+                constant= k/lead
+                key= tuple((j, self._presolve_key(x)) for j, x in direction)
+
+                bucket= buckets.setdefault(key, [])
+                for other, other_direction, other_constant in bucket:
+                    if self._same_direction(direction, other_direction):
+                        if is_near_zero(constant - other_constant):
+                            report.duplicates.append((i, other))
+                        else:
+                            # parallel but not the same plane
+                            if report.inconsistent is None:
+                                report.inconsistent= (other, i)
+                            report.kept.append(i)
+                        break
+                else:
+                    bucket.append((i, direction, constant))
+                    report.kept.append(i)
+
+        return self._subsystem(report.kept), report
+
+    def _presolve_key(self, x):
+        # hashable value that is the same for near equal coefficients
+        # (except right at a rounding boundary, those are just not merged)
+        eps= self.backend.eps
+        if eps == 0:
+            return x
+        return round(float(x) / float(eps), -2)
+
+    def _same_direction(self, a, b):
+        if len(a) != len(b):
+            return False
+        is_near_zero= self.backend.is_near_zero
+        for (j, x), (l, y) in zip(a, b):
+            if j != l or not is_near_zero(x - y):
+                return False
+        return True
+
+    def _row_items(self, i):
+        # (column, coefficient) of one equation
+        return enumerate(self._rows[i][:-1])
+
+    def _subsystem(self, indices):
+        # system with some of the equations, sharing their rows (copy on write)
+        system= self.snapshot()
+        system._rows= [system._rows[i] for i in indices]
+        system._planes= [system._planes[i] for i in indices]
+        system._owned= [False] * len(indices)
+        return system
+
+    @staticmethod
+    def solve_many(systems, workers=None, chunksize=None):
+        # solve a lot of independent systems, the results are Solution objects
+        # in the same order as the systems. Small batches are solved right
+        # here, starting the process pool would cost more than it saves
+        # multiprocessing is only imported when it is needed
+        from multiprocessing import Pool, cpu_count
+
+        systems= list(systems)
+        if workers is None:
+            workers= cpu_count()
+
+        if workers <= 1 or len(systems) < SOLVE_MANY_SERIAL_THRESHOLD:
+            return [s.compute_solution() for s in systems]
+
+        if chunksize is None:
+            # a few chunks per worker, so a slow chunk doesn't hold up the rest
+            chunksize= max(1, int(ceil(len(systems) / (workers * 4.))))
+
+        pool= Pool(workers)
+        try:
+            return pool.map(_compute_solution, systems, chunksize)
+        finally:
+            pool.close()
+            pool.join()
 
     def parametrization(self, rref):
         
 
-        free_variables= []
-        for i, j in enumerate(rref.indices_of_first_nonzero_terms_in_each_row()):
-            if i != j:
-                free_variables.append(i)
-        free_variables
-        
+        # every variable that is not a pivot of some equation is free
+        pivot_in_eq= rref._pivot_columns()
+        free_variables= [j for j in range(self.dimension) if j not in pivot_in_eq]
 
-        pivot_in_eq= rref.indices_of_first_nonzero_terms_in_each_row()
         # i need to know which variable in which equations, because sometimes x_3 in 2nd equation
         for i in range(self.dimension):
             # start from first variables
@@ -71,15 +282,16 @@ class LinearSystem(object):
             if i in pivot_in_eq:
                 # not free
                 eq= pivot_in_eq.index(i) # get which equation
-                output+= str(round(rref[eq].constant_term, 3))
+                output+= str(round(rref._rows[eq][-1], 3))
                 for k, l in enumerate(free_variables):
                     if l >= self.dimension:
                     # sometime there will be more free variables than dimension
                         break
-                    if rref[eq].normal_vector.coordinates[l] >= 0:
-                        output= output + ' - ' + str(round(rref[eq].normal_vector.coordinates[l],3))
+                    coe= rref._coefficient(eq, l)
+                    if coe >= 0:
+                        output= output + ' - ' + str(round(coe,3))
                     else:
-                        output= output + ' + ' + str(round(abs(rref[eq].normal_vector.coordinates[l]),3))
+                        output= output + ' + ' + str(round(abs(coe),3))
                     output+= ' t_{}'.format(k+1)  
                 print output               
             else:
@@ -98,8 +310,31 @@ class LinearSystem(object):
         
         
             
-    def compute_rref(self):
-        tf= self.compute_triangular_form()
+    def compute_parametrization(self, rref):
+        # what parametrization() prints, as a Parametrization: the point with
+        # every free variable 0 and one direction vector per free variable
+        pivot_in_eq= rref._pivot_columns()
+        free_variables= [j for j in range(self.dimension) if j not in pivot_in_eq]
+        zero, one= self.backend.zero, self.backend.one
+
+        basepoint= [zero] * self.dimension
+        for i, j in enumerate(pivot_in_eq):
+            if 0 <= j < self.dimension:
+                basepoint[j]= rref._rows[i][-1]
+
+        directions= []
+        for l in free_variables:
+            direction= [zero] * self.dimension
+            direction[l]= one
+            for i, j in enumerate(pivot_in_eq):
+                if 0 <= j < self.dimension:
+                    direction[j]= -rref._coefficient(i, l)
+            directions.append(Vector(direction, self.backend))
+        return Parametrization(Vector(basepoint, self.backend), directions)
+
+
+    def compute_rref(self, in_place=False):
+        tf= self.compute_triangular_form(in_place)
         
         # if the system has less equation than dimension, or other way around,
         # it may cause index out of range. n stands for number of pivot(maximum)
@@ -108,78 +343,192 @@ class LinearSystem(object):
         else:
             n= self.dimension
         
-        # all coefficient of pivot become 1
-        for i in range(n):
-            for j in range(i, self.dimension):
-                # if the coe is 0 on pivot position, then search for next
-                if not MyDecimal(tf[i].normal_vector.coordinates[j]).is_near_zero():
-                    coe= Decimal('1.0')/tf[i].normal_vector.coordinates[j]
-                    tf.multiply_coefficient_and_row(coe, i)
-                    break # once done, break the current loop
-                    
-        for i, j in reversed(list(enumerate(tf.indices_of_first_nonzero_terms_in_each_row()))):
-            # i means i-th equation, j means first non-zero variable on i-th equation
-            if j == -1:
-                # j == -1 means all coe zero, skip this loop
-                continue
-            for k in range(i-1, -1, -1):             
-                coe= tf[k].normal_vector.coordinates[j]
-                tf.add_multiple_times_row_to_row(-coe, i, k)
-            
-        return tf
-            
-    def compute_triangular_form(self):
-        system= deepcopy(self)
-        
+        is_near_zero= tf.backend.is_near_zero
+        zero, one= tf.backend.zero, tf.backend.one
+        rows= tf._rows
+
+        with tf.backend.local():
+            # all coefficient of pivot become 1
+            for i in range(n):
+                for j in range(i, self.dimension):
+                    # if the coe is 0 on pivot position, then search for next
+                    if not is_near_zero(rows[i][j]):
+                        coe= one/rows[i][j]
+                        tf.multiply_coefficient_and_row(coe, i)
+                        rows[i][j]= one
+                        break # once done, break the current loop
+
+            for i, j in reversed(list(enumerate(tf.indices_of_first_nonzero_terms_in_each_row()))):
+                # i means i-th equation, j means first non-zero variable on i-th equation
+                if j == -1:
+                    # j == -1 means all coe zero, skip this loop
+                    continue
+                for k in range(i-1, -1, -1):
+                    coe= rows[k][j]
+                    if coe != 0:
+                        tf.add_multiple_times_row_to_row(-coe, i, k)
+                        rows[k][j]= zero
 
-        for i in range(len(system)-1):
+        return tf
             
-            # this loop will swap equations when its pivot = 0 to next (downward)
-            # equation whose variable on the same position is not 0            
-            for j in range(system.dimension):
-                if (i == j) and (MyDecimal(system[i].normal_vector.coordinates[i]).is_near_zero()):
-                    temp= i+1
-                    while temp < len(system):
-                        #print system[temp].normal_vector.coordinates[j]
-                        if system[temp].normal_vector.coordinates[i] != 0:
-                            system.swap_rows(i, temp)
-                            break
-                        temp += 1
-                        
-            #print 'after swap: \n', system
-
-            # this loop will perform elimination downward for each i
-            for j in range(i+1, len(system)):
-                #print 'i, j: ', i, j
-                
-                # when there are two equal equations in the system, will have ZeroDivisionError
-                if not MyDecimal(system[i].normal_vector.coordinates[i]).is_near_zero():
-                    #print system[i].normal_vector.coordinates[i], system[j].normal_vector.coordinates[i]
-                    coe= system[j].normal_vector.coordinates[i]/system[i].normal_vector.coordinates[i]
-                    system.add_multiple_times_row_to_row(-coe, i, j)
+    def compute_triangular_form(self, in_place=False):
+        if in_place:
+            system= self
+        else:
+            system= self.snapshot()
+        system._triangularize()
+        return system
 
 
-        return system
+    def _triangularize(self, lower=None, permutation=None):
+        # forward elimination on this system itself, returns the pivot column
+        # of each pivot row. When lower is given (one dict per row) the
+        # multipliers are saved in it, lower[k][i] = coe means coe times row i
+        # was subtracted from row k, and rows swaps are applied to permutation
+        rows= self._rows
+        num_equations= len(rows)
+
+        is_near_zero= self.backend.is_near_zero
+        zero= self.backend.zero
+        pivot_columns= []
+        # float rounding grows with the multipliers, so in float64 the pivot
+        # is the largest entry of the column (partial pivoting). Decimal and
+        # Fraction keep the first nonzero one, as in the class
+        partial_pivoting= isinstance(self.backend, FloatBackend)
+
+        # i is the row that gets the next pivot, j is the column we look at.
+        # when the whole column under row i is zero, move on to next column
+        # but keep the same row, so the result is always in echelon form
+        with self.backend.local():
+            i= 0
+            for j in range(self.dimension):
+                if i >= num_equations:
+                    break
+
+                # swap equations when its pivot = 0 to next (downward)
+                # equation whose variable on the same position is not 0
+                if partial_pivoting:
+                    temp= max(range(i, num_equations), key=lambda k: abs(rows[k][j]))
+                    if is_near_zero(rows[temp][j]):
+                        continue
+                elif is_near_zero(rows[i][j]):
+                    for temp in range(i+1, num_equations):
+                        if not is_near_zero(rows[temp][j]):
+                            break
+                    else:
+                        continue
+                else:
+                    temp= i
+                if temp != i:
+                    self.swap_rows(i, temp)
+                    if lower is not None:
+                        lower[i], lower[temp]= lower[temp], lower[i]
+                        permutation[i], permutation[temp]= permutation[temp], permutation[i]
+
+                # perform elimination downward for row i
+                pivot= rows[i][j]
+                for k in range(i+1, num_equations):
+                    if rows[k][j] != 0:
+                        coe= rows[k][j]/pivot
+                        self.add_multiple_times_row_to_row(-coe, i, k)
+                        # it is exactly zero in theory, don't keep the rounding error
+                        rows[k][j]= zero
+                        if lower is not None:
+                            lower[k][i]= coe
+                pivot_columns.append(j)
+                i += 1
+
+        return pivot_columns
+
+
+    def factorize(self):
+        # LU factorization of the coefficients (the constant terms are not
+        # part of it), so the system can be solved again for new constants
+        # without redoing the elimination. It is kept until a row changes
+        if self._factorization is None:
+            self._factorization= LUFactorization(self)
+        return self._factorization
+
+
+    def compute_refined_solution(self, tol=None, max_steps=10, exact=False):
+        # Decimal accuracy at close to float64 speed: float64 LU and
+        # iterative refinement with Decimal (exact=True: Fraction) residuals,
+        # see refine.py. Falls back to compute_solution() when it can't
+        # converge, the RefinedSolution tells the steps and final residual
+        from refine import refine_solve
+        return refine_solve(self, tol, max_steps, exact)
+
+
+    def compute_iterative_solution(self, method='cg', x0=None, tol=1e-10, max_iter=None,
+                                   callback=None, omega=1., preconditioner=None):
+        # approximate float solution of a big square system, O(nnz) per
+        # iteration, see iterative.py. method is 'jacobi', 'gauss_seidel',
+        # 'sor' (with omega) or 'cg' (with preconditioner=None or 'diagonal')
+        import iterative
+        if method == 'cg':
+            return iterative.conjugate_gradient(self, x0, tol, max_iter, callback, preconditioner)
+        if method not in iterative.METHODS:
+            raise ValueError('Unknown iterative method: {}'.format(method))
+        if max_iter is None:
+            max_iter = 1000
+        if method == 'jacobi':
+            return iterative.jacobi(self, x0, tol, max_iter, callback)
+        if method == 'gauss_seidel':
+            omega = 1.
+        return iterative.sor(self, omega, x0, tol, max_iter, callback)
+
+
+    def compute_exact_solution(self):
+        # exact solve whatever the backend, see BareissElimination: verdict,
+        # rank, determinant and the solution as Fractions, no is_near_zero
+        return BareissElimination(self)
+
+
+    def _dense_snapshot(self):
+        return self.snapshot()
 
 
     def swap_rows(self, row1, row2):
-        self[row1], self[row2] = self[row2], self[row1]
+        self._factorization = None
+        self._rows[row1], self._rows[row2] = self._rows[row2], self._rows[row1]
+        self._owned[row1], self._owned[row2] = self._owned[row2], self._owned[row1]
+        self._planes[row1], self._planes[row2] = self._planes[row2], self._planes[row1]
 
 
     def multiply_coefficient_and_row(self, coefficient, row):
-        new_n= self[row].normal_vector.times_scalar(coefficient)
-        new_k= self[row].constant_term*coefficient
-        self[row]= Plane(normal_vector=new_n, constant_term= new_k)
-        pass # add your code here
+        coefficient= self.backend.convert(coefficient)
+        r= self._writable_row(row)
+        with self.backend.local():
+            for k in range(len(r)):
+                r[k]= r[k]*coefficient
 
 
     def add_multiple_times_row_to_row(self, coefficient, row_to_add, row_to_be_added_to):
-        add_vector= self[row_to_add].normal_vector.times_scalar(coefficient)
-        add_term= self[row_to_add].constant_term*coefficient
-        new_vector= self[row_to_be_added_to].normal_vector.plus(add_vector)
-        new_constant= self[row_to_be_added_to].constant_term + add_term
-        self[row_to_be_added_to]= Plane(new_vector, new_constant)
-        pass         
+        coefficient= self.backend.convert(coefficient)
+        src= self._rows[row_to_add]
+        dst= self._writable_row(row_to_be_added_to)
+        with self.backend.local():
+            for k in range(len(dst)):
+                if src[k] != 0:
+                    dst[k]= dst[k] + src[k]*coefficient
+
+
+    def _is_zero_row(self, row):
+        # check the coefficients only, not the constant term
+        r= self._rows[row]
+        for j in range(self.dimension):
+            if not self.backend.is_near_zero(r[j]):
+                return False
+        return True
+
+
+    def _coefficient(self, row, col):
+        return self._rows[row][col]
+
+
+    def _pivot_columns(self):
+        # the pivot variable of each equation of a reduced system, -1 for 0=k
+        return self.indices_of_first_nonzero_terms_in_each_row()
 
 
     def indices_of_first_nonzero_terms_in_each_row(self):
@@ -188,37 +537,85 @@ class LinearSystem(object):
 
         indices = [-1] * num_equations
 
-        for i,p in enumerate(self.planes):
-            try:
-                indices[i] = p.first_nonzero_index(p.normal_vector.coordinates)
-            except Exception as e:
-                if str(e) == Plane.NO_NONZERO_ELTS_FOUND_MSG:
-                    continue
-                else:
-                    raise e
+        for i,row in enumerate(self._rows):
+            for j in range(num_variables):
+                if not self.backend.is_near_zero(row[j]):
+                    indices[i] = j
+                    break
 
         return indices
 
 
     def __len__(self):
-        return len(self.planes)
+        return len(self._rows)
 
 
     def __getitem__(self, i):
-        # these method can let you use LinearSystem[i] to access self.planes[i]
-        return self.planes[i]
+        # these method can let you use LinearSystem[i] to access the i-th plane,
+        # the plane is only created here, the first time it is asked for
+        p = self._planes[i]
+        if p is None:
+            row = self._rows[i]
+            p = make_hyperplane(Vector(row[:-1], self.backend), row[-1], self.backend)
+            self._planes[i] = p
+        return p
 
 
     def __setitem__(self, i, x):
         # like __getitem__, this method can let you use LinearSystem[i] == new plane
         try:
             assert x.dimension == self.dimension
-            self.planes[i] = x
+            self._rows[i] = self._row_from_plane(x)
+            self._planes[i] = x if x.backend == self.backend else None
+            self._owned[i] = True
+            self._factorization = None
 
         except AssertionError:
             raise Exception(self.ALL_PLANES_MUST_BE_IN_SAME_DIM_MSG)
 
 
+    def __getstate__(self):
+        # the cached planes can always be built again from the rows,
+        # don't send them through pickle (e.g. to solve_many() workers)
+        return {'dimension': self.dimension, 'backend': self.backend, '_rows': self._rows}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._planes = [None] * len(self._rows)
+        self._owned = [True] * len(self._rows)
+        self._factorization = None
+
+
+    def least_squares(self, method='qr'):
+        # best fit solution (float64) when there are more equations than
+        # unknowns and solve() says there is no solution
+        from lstsq import LeastSquaresSolver
+        rows= self._dense_snapshot()._rows
+        solver= LeastSquaresSolver(self.dimension, method)
+        solver.add_rows([[float(x) for x in r[:-1]] for r in rows], [float(r[-1]) for r in rows])
+        return solver.solve()
+
+
+    def incremental(self):
+        # a copy of this system that keeps its rref up to date while
+        # equations are added, removed or replaced
+        from incremental import IncrementalLinearSystem
+        return IncrementalLinearSystem.from_system(self)
+
+
+    def save(self, path):
+        # binary file that storage.load() memory maps, see storage.py
+        from storage import save_system
+        save_system(path, self)
+
+
+    def to_sparse(self):
+        from sparse import SparseLinearSystem
+        return SparseLinearSystem.from_rows([r[:-1] for r in self._rows],
+                                            [r[-1] for r in self._rows],
+                                            self.dimension, self.backend)
+
+
     def __str__(self):
         ret = 'Linear System:\n'
         temp = ['Equation {}: {}'.format(i+1,p) for i,p in enumerate(self.planes)]
@@ -226,34 +623,287 @@ class LinearSystem(object):
         return ret
 
 
-class MyDecimal(Decimal):
-    def is_near_zero(self, eps=1e-10):
-        return abs(self) < eps
+class Solution(object):
+
+    # outcome of LinearSystem.compute_solution(): verdict is one of
+    # LinearSystem.UNIQUE_SOLUTION, NO_SOLUTIONS or INF_SOLUTIONS,
+    # point is the solution Vector when it is unique, otherwise None
+
+    def __init__(self, verdict, rref, point=None):
+        self.verdict = verdict
+        self.rref = rref
+        self.point = point
+        self.presolve_report = None
+
+    def __str__(self):
+        if self.point is not None:
+            return 'Solution: {} {}'.format(self.verdict, self.point)
+        return 'Solution: {}'.format(self.verdict)
+
+
+class Parametrization(object):
+
+    # every solution is basepoint + t_1 direction_vectors[0] + ...
+
+    def __init__(self, basepoint, direction_vectors):
+        self.basepoint = basepoint
+        self.direction_vectors = direction_vectors
+
+    def __str__(self):
+        ret = 'Parametrization: {}'.format(self.basepoint)
+        for k, v in enumerate(self.direction_vectors):
+            ret += ' + t_{} {}'.format(k+1, v)
+        return ret
+
+
+class LUFactorization(object):
+
+    # P A = L U for the coefficient matrix A of a system, made by the same
+    # forward elimination as compute_triangular_form(). P is kept as
+    # permutation (permutation[i] is the original equation that ended up in
+    # row i), L as one dict of multipliers per row and U as the echelon rows.
+    # solve() then only needs a forward and a back substitution, O(n^2)
+
+    def __init__(self, system):
+        work = system._dense_snapshot()
+        num_equations = len(work)
+        self.dimension = work.dimension
+        self.backend = work.backend
+        self.lower = [{} for _ in range(num_equations)]
+        self.permutation = list(range(num_equations))
+        self.pivot_columns = work._triangularize(self.lower, self.permutation)
+        self.upper = [row[:-1] for row in work._rows[:len(self.pivot_columns)]]
+        self.rank = len(self.pivot_columns)
+
+    def __len__(self):
+        return len(self.permutation)
+
+    def solve(self, rhs):
+        # rhs is one constant term per equation, in the original order, or a
+        # list of those to solve for many right-hand sides at once. Returns
+        # the solution Vector (or a list of them)
+        rhs = list(rhs)
+        if rhs and isinstance(rhs[0], (list, tuple, Vector)):
+            return [self._solve_one(r) for r in rhs]
+        return self._solve_one(rhs)
+
+    def _solve_one(self, rhs):
+        if isinstance(rhs, Vector):
+            rhs = rhs.coordinates
+        if len(rhs) != len(self):
+            raise ValueError('Expected {} constant terms, got {}'.format(len(self), len(rhs)))
+
+        backend = self.backend
+        convert = backend.convert
+        with backend.local():
+            # forward substitution, L y = P b
+            y = [convert(rhs[p]) for p in self.permutation]
+            for k in range(len(y)):
+                for i, coe in self.lower[k].items():
+                    y[k] = y[k] - coe*y[i]
+
+            # rows below the rank are 0 = y[k]
+            for k in range(self.rank, len(y)):
+                if not backend.is_near_zero(y[k]):
+                    raise Exception(LinearSystem.NO_SOLUTIONS_MSG)
+            if self.rank < self.dimension:
+                raise Exception(LinearSystem.INF_SOLUTIONS_MSG)
+
+            # back substitution, U x = y
+            x = [backend.zero] * self.dimension
+            for t in range(self.rank - 1, -1, -1):
+                row = self.upper[t]
+                j = self.pivot_columns[t]
+                total = y[t]
+                for l in range(j+1, self.dimension):
+                    if row[l] != 0:
+                        total = total - row[l]*x[l]
+                x[j] = total/row[j]
+
+        return Vector(x, backend)
+
+
+class BareissElimination(object):
+
+    # exact elimination of a system: every equation is converted to
+    # Fractions and multiplied by the lcm of its denominators, then the
+    # integer rows are reduced with fraction-free (Bareiss) elimination,
+    #   a_ij <- (a_rc a_ij - a_ic a_rj) / previous pivot
+    # where the division is always exact. The entries stay minors of the
+    # matrix, so they grow like a determinant instead of exponentially as
+    # with plain integer elimination, and there are no Fractions to reduce
+    # by a gcd at every step as with the Fraction backend.
+    # verdict is one of the LinearSystem verdicts, rank and pivot_columns
+    # are exact, determinant is a Fraction for a square system (else None)
+    # and point the solution Vector (fraction backend) when it is unique
+
+    def __init__(self, system):
+        rows = system._dense_snapshot()._rows
+        self.dimension = system.dimension
+        n = self.dimension
+
+        # integer rows, det(A) = det(integer A) / product of the scales
+        scale = Fraction(1)
+        matrix = []
+        for row in rows:
+            row = [Fraction(x) for x in row]
+            lcm = 1
+            for x in row:
+                lcm = lcm * x.denominator // gcd(lcm, x.denominator)
+            matrix.append([int(x * lcm) for x in row])
+            scale *= lcm
+
+        sign = 1
+        previous = 1
+        pivot_columns = []
+        r = 0
+        for c in range(n):
+            if r == len(matrix):
+                break
+            for i in range(r, len(matrix)):
+                if matrix[i][c] != 0:
+                    break
+            else:
+                continue
+            if i != r:
+                matrix[i], matrix[r] = matrix[r], matrix[i]
+                sign = -sign
+
+            pivot_row = matrix[r]
+            p = pivot_row[c]
+            tail = pivot_row[c+1:]
+            for i in range(r + 1, len(matrix)):
+                row = matrix[i]
+                a = row[c]
+                if a == 0:
+                    new_tail = [p*x // previous for x in row[c+1:]]
+                else:
+                    new_tail = [(p*x - a*y) // previous for x, y in zip(row[c+1:], tail)]
+                matrix[i] = row[:c] + [0] + new_tail
+            previous = p
+            pivot_columns.append(c)
+            r += 1
+
+        self.rank = r
+        self.pivot_columns = pivot_columns
+        self.upper = matrix[:r]
+
+        self.determinant = None
+        if len(matrix) == n:
+            if r == n:
+                self.determinant = sign * previous / scale
+            else:
+                self.determinant = Fraction(0)
+
+        self.point = None
+        if any(row[-1] != 0 for row in matrix[r:]):
+            self.verdict = LinearSystem.NO_SOLUTIONS
+        elif r < n:
+            self.verdict = LinearSystem.INF_SOLUTIONS
+        else:
+            self.verdict = LinearSystem.UNIQUE_SOLUTION
+            # back substitution, the only place with Fractions
+            x = [Fraction(0)] * n
+            for t in range(n - 1, -1, -1):
+                row = matrix[t]
+                total = row[-1]
+                for l in range(t + 1, n):
+                    if row[l] != 0:
+                        total -= row[l] * x[l]
+                x[t] = Fraction(total) / row[t]
+            self.point = Vector(x, 'fraction')
+
+    def __str__(self):
+        ret = 'Exact solution: {} rank={}'.format(self.verdict, self.rank)
+        if self.determinant is not None:
+            ret += ' determinant={}'.format(self.determinant)
+        if self.point is not None:
+            ret += ' {}'.format(self.point)
+        return ret
 
 
+class PresolveReport(object):
 
-p0 = Plane(normal_vector=Vector(['1','2','3']), constant_term='1')
-p1 = Plane(normal_vector=Vector(['2','4','6']), constant_term='2')
-p2 = Plane(normal_vector=Vector(['1','2','4']), constant_term='3')
+    # what LinearSystem.presolve() did, all by index of the original equations:
+    # kept, zero_rows (0=0 dropped), duplicates ((dropped, equal kept one))
+    # and inconsistent, None or the first pair that shows there is no
+    # solution (i, i) for a 0=k row
 
+    def __init__(self, num_equations):
+        self.num_equations = num_equations
+        self.kept = []
+        self.zero_rows = []
+        self.duplicates = []
+        self.inconsistent = None
 
-s = LinearSystem([p0,p1,p2])
-print s.solve()
+    def num_removed(self):
+        return len(self.zero_rows) + len(self.duplicates)
 
-p0 = Plane(normal_vector=Vector(['0.786','0.786','0.588']), constant_term='-0.714')
-p1 = Plane(normal_vector=Vector(['-0.138','-0.138','0.244']), constant_term='0.319')
-s = LinearSystem([p0,p1])
-print s.solve()
+    def __str__(self):
+        ret = 'Presolve: kept {} of {} equations, removed {} 0=0 rows and {} duplicates'.format(
+            len(self.kept), self.num_equations, len(self.zero_rows), len(self.duplicates))
+        if self.inconsistent is not None:
+            ret += ', no solutions (equations {} and {})'.format(
+                self.inconsistent[0]+1, self.inconsistent[1]+1)
+        return ret
 
-p0 = Plane(normal_vector=Vector(['8.631','5.112','-1.816']), constant_term='-5.113')
-p1 = Plane(normal_vector=Vector(['4.315','11.132','-5.27']), constant_term='-6.775')
-p2 = Plane(normal_vector=Vector(['-2.158','3.01','-1.727']), constant_term='-0.831')
-s = LinearSystem([p0,p1, p2])
-print s.solve()
 
-p0 = Plane(normal_vector=Vector(['0.935','1.76','-9.365']), constant_term='-9.955')
-p1 = Plane(normal_vector=Vector(['0.187','0.352','-1.873']), constant_term='-1.991')
-p2 = Plane(normal_vector=Vector(['0.374','0.704','-3.746']), constant_term='-3.982')
-p3 = Plane(normal_vector=Vector(['-0.561','-1.056','5.619']), constant_term='5.973')
-s = LinearSystem([p0, p1, p2, p3])
-print s.solve()
+def make_hyperplane(normal_vector, constant_term, backend=None):
+    # the equations of a system in 3 dimensions stay Plane objects as they
+    # always were, any other dimension gets a Hyperplane
+    if normal_vector.dimension == 3:
+        return Plane(normal_vector, constant_term, backend)
+    return Hyperplane(normal_vector, constant_term, backend=backend)
+
+
+def _compute_solution(system):
+    # module level so that the process pool can pickle it
+    return system.compute_solution()
+
+
+if __name__ == '__main__':
+    p0 = Plane(normal_vector=Vector(['1','2','3']), constant_term='1')
+    p1 = Plane(normal_vector=Vector(['2','4','6']), constant_term='2')
+    p2 = Plane(normal_vector=Vector(['1','2','4']), constant_term='3')
+
+
+    s = LinearSystem([p0,p1,p2])
+    print s.solve()
+
+    p0 = Plane(normal_vector=Vector(['0.786','0.786','0.588']), constant_term='-0.714')
+    p1 = Plane(normal_vector=Vector(['-0.138','-0.138','0.244']), constant_term='0.319')
+    s = LinearSystem([p0,p1])
+    print s.solve()
+
+    p0 = Plane(normal_vector=Vector(['8.631','5.112','-1.816']), constant_term='-5.113')
+    p1 = Plane(normal_vector=Vector(['4.315','11.132','-5.27']), constant_term='-6.775')
+    p2 = Plane(normal_vector=Vector(['-2.158','3.01','-1.727']), constant_term='-0.831')
+    s = LinearSystem([p0,p1, p2])
+    print s.solve()
+
+    p0 = Plane(normal_vector=Vector(['0.935','1.76','-9.365']), constant_term='-9.955')
+    p1 = Plane(normal_vector=Vector(['0.187','0.352','-1.873']), constant_term='-1.991')
+    p2 = Plane(normal_vector=Vector(['0.374','0.704','-3.746']), constant_term='-3.982')
+    p3 = Plane(normal_vector=Vector(['-0.561','-1.056','5.619']), constant_term='5.973')
+    s = LinearSystem([p0, p1, p2, p3])
+    print s.solve()
+
+    # the N-dimensional path at large dimensions: Decimal elimination against
+    # the exact (Bareiss) solution, float elimination against numpy
+    import random
+    import numpy as np
+    rng = random.Random(0)
+    for n, backend in ((60, 'decimal'), (200, 'float')):
+        rows = [['{:.3f}'.format(rng.uniform(-10, 10)) for _ in range(n + 1)] for _ in range(n)]
+        s = LinearSystem([Hyperplane(Vector(r[:-1], backend), r[-1]) for r in rows])
+        point = s.compute_solution().point.coordinates
+        if backend == 'decimal':
+            expected = s.compute_exact_solution().point.coordinates
+            error = max(abs(Fraction(x) - y) for x, y in zip(point, expected))
+            assert error < Fraction(1, 10**20)
+        else:
+            a = np.array([[float(x) for x in r[:-1]] for r in rows])
+            b = np.array([float(r[-1]) for r in rows])
+            error = np.abs(np.linalg.solve(a, b) - np.array(point)).max()
+            assert error < 1e-8
+        print '{} variables ({}): max error {:.3g}'.format(n, backend, float(error))
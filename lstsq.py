@@ -0,0 +1,133 @@
+from itertools import islice
+
+import numpy as np
+
+from vector import Vector
+
+
+class LeastSquaresResult(object):
+
+    # point is the best fit Vector (float backend), residual the 2-norm of
+    # A x - b over all the equations that were seen
+
+    def __init__(self, point, residual, rank, num_equations):
+        self.point = point
+        self.residual = residual
+        self.rank = rank
+        self.num_equations = num_equations
+
+    def __str__(self):
+        return 'Least squares: {} residual={} rank={} equations={}'.format(
+            self.point, self.residual, self.rank, self.num_equations)
+
+
+class LeastSquaresSolver(object):
+
+    # Best fit solution of an overdetermined system whose equations arrive in
+    # chunks, memory only depends on the number of unknowns n.
+    #
+    # method='qr' keeps the (n+1) x (n+1) R factor of the augmented matrix
+    # [A | b] and folds every chunk into it with another QR (TSQR). The
+    # solution comes from R[:n, :n] x = R[:n, n] and |R[n, n]| is the residual.
+    # method='normal' accumulates A^T A, A^T b and b^T b instead, cheaper per
+    # chunk but it squares the condition number.
+
+    METHODS = ('qr', 'normal')
+
+    def __init__(self, dimension, method='qr'):
+        if method not in self.METHODS:
+            raise ValueError('Unknown least squares method: {}'.format(method))
+        self.dimension = dimension
+        self.method = method
+        self.num_equations = 0
+        if method == 'qr':
+            self._r = np.zeros((0, dimension + 1))
+        else:
+            self._gram = np.zeros((dimension, dimension))
+            self._atb = np.zeros(dimension)
+            self._btb = 0.
+
+    def add_rows(self, coefficients, constants):
+        # one chunk, coefficients is k x n and constants has length k
+        a = np.asarray(coefficients, dtype=np.float64)
+        b = np.asarray(constants, dtype=np.float64)
+        if a.ndim != 2 or a.shape[1] != self.dimension or a.shape[0] != b.shape[0]:
+            raise ValueError('Expected a k x {} chunk with k constant terms'.format(self.dimension))
+        if a.shape[0] == 0:
+            return
+        self.num_equations += a.shape[0]
+
+        if self.method == 'qr':
+            stacked = np.vstack([self._r, np.column_stack([a, b])])
+            self._r = np.linalg.qr(stacked, mode='r')
+        else:
+            self._gram += a.T.dot(a)
+            self._atb += a.T.dot(b)
+            self._btb += b.dot(b)
+
+    def add_equations(self, equations, chunksize=10000):
+        # equations is any iterable of Plane/Line objects or
+        # (coefficients, constant) pairs, it is consumed chunksize at a time
+        equations = iter(equations)
+        while True:
+            chunk = list(islice(equations, chunksize))
+            if not chunk:
+                break
+            a = np.empty((len(chunk), self.dimension))
+            b = np.empty(len(chunk))
+            for i, eq in enumerate(chunk):
+                if hasattr(eq, 'normal_vector'):
+                    a[i] = [float(x) for x in eq.normal_vector.coordinates]
+                    b[i] = float(eq.constant_term)
+                else:
+                    a[i] = [float(x) for x in eq[0]]
+                    b[i] = float(eq[1])
+            self.add_rows(a, b)
+
+    def solve(self):
+        n = self.dimension
+        if self.num_equations == 0:
+            raise ValueError('No equations to fit')
+
+        if self.method == 'qr':
+            r = np.zeros((n + 1, n + 1))
+            r[:self._r.shape[0]] = self._r[:n + 1]
+            x, _, rank, _ = np.linalg.lstsq(r[:n, :n], r[:n, n], rcond=None)
+            # the part of b that no combination of the columns can reach
+            residual = np.sqrt(np.sum((r[:n, :n].dot(x) - r[:n, n]) ** 2) + r[n, n] ** 2)
+        else:
+            x, _, rank, _ = np.linalg.lstsq(self._gram, self._atb, rcond=None)
+            # |Ax - b|^2 = x^T A^T A x - 2 x^T A^T b + b^T b, rounding can make it < 0
+            squared = x.dot(self._gram).dot(x) - 2 * x.dot(self._atb) + self._btb
+            residual = np.sqrt(max(squared, 0.))
+
+        return LeastSquaresResult(Vector(x.tolist(), 'float'), float(residual),
+                                  int(rank), self.num_equations)
+
+
+def read_equations(source, delimiter=None):
+    # yield (coefficients, constant) from a text file, one equation per line
+    # "a_1 a_2 ... a_n k" (or split on delimiter, e.g. ','). Empty lines and
+    # lines starting with # are skipped. source is a path or an open file
+    if isinstance(source, basestring):
+        with open(source) as f:
+            for eq in read_equations(f, delimiter):
+                yield eq
+        return
+
+    for line in source:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        values = [float(x) for x in line.split(delimiter)]
+        yield values[:-1], values[-1]
+
+
+def solve_least_squares(equations, dimension, method='qr', chunksize=10000):
+    # equations is an iterable (see LeastSquaresSolver.add_equations), a path
+    # or an open file (see read_equations)
+    if isinstance(equations, basestring) or hasattr(equations, 'readline'):
+        equations = read_equations(equations)
+    solver = LeastSquaresSolver(dimension, method)
+    solver.add_equations(equations, chunksize)
+    return solver.solve()
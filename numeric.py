@@ -0,0 +1,211 @@
+from math import sqrt
+from decimal import Decimal, Context, getcontext, localcontext
+from fractions import Fraction
+
+
+# A backend decides which number type the coordinates and constant terms are
+# stored in, how they are converted, and which tolerance is "near zero".
+# Vector, Line, Plane and LinearSystem all take a backend argument, which can
+# be a backend object or one of the names in BACKENDS. When it is None the
+# process-wide default (Decimal, prec=30, as before) is used.
+
+
+class _NoContext(object):
+
+    # used by the backends that don't need a decimal context
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *args):
+        return False
+
+
+_NO_CONTEXT = _NoContext()
+
+
+class FloatBackend(object):
+
+    name = 'float'
+    # the default tolerance, also the one of the numpy code (LineArray,
+    # PlaneArray and the window intersections) that works in float64
+    eps = 1e-10
+
+    def __init__(self, eps=None, orthogonal_eps=1e-10):
+        self.zero = 0.0
+        self.one = 1.0
+        if eps is not None:
+            self.eps = eps
+        # float rounding error is much bigger than Decimal's,
+        # so the orthogonal test can't be as strict
+        self.orthogonal_eps = orthogonal_eps
+
+    def convert(self, x):
+        return float(x)
+
+    def sqrt(self, x):
+        return sqrt(x)
+
+    def is_near_zero(self, x, eps=None):
+        if eps is None:
+            eps = self.eps
+        return abs(x) < eps
+
+    def local(self):
+        return _NO_CONTEXT
+
+    def __eq__(self, other):
+        return (isinstance(other, FloatBackend) and
+                (self.eps, self.orthogonal_eps) == (other.eps, other.orthogonal_eps))
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash((self.name, self.eps, self.orthogonal_eps))
+
+    def __repr__(self):
+        return 'FloatBackend(eps={})'.format(self.eps)
+
+
+class DecimalBackend(object):
+
+    name = 'decimal'
+
+    def __init__(self, prec=30):
+        self.prec = prec
+        self.context = Context(prec=prec)
+        self.zero = Decimal(0)
+        self.one = Decimal(1)
+        # with prec=30 these are the 1e-10 and 1e-20 the code always used,
+        # they get stricter (or looser) together with the precision
+        self.eps = Decimal(10) ** -(prec // 3)
+        self.orthogonal_eps = Decimal(10) ** -(2 * prec // 3)
+
+    def convert(self, x):
+        if isinstance(x, Fraction):
+            with self.local():
+                return Decimal(x.numerator) / Decimal(x.denominator)
+        return Decimal(x)
+
+    def sqrt(self, x):
+        return self.context.sqrt(x)
+
+    def is_near_zero(self, x, eps=None):
+        if eps is None:
+            eps = self.eps
+        return abs(x) < eps
+
+    def local(self):
+        # arithmetic on Decimal objects uses the thread's current context,
+        # only switch it when it doesn't have our precision already
+        if getcontext().prec == self.prec:
+            return _NO_CONTEXT
+        return localcontext(self.context)
+
+    def __eq__(self, other):
+        return isinstance(other, DecimalBackend) and self.prec == other.prec
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash((self.name, self.prec))
+
+    def __repr__(self):
+        return 'DecimalBackend(prec={})'.format(self.prec)
+
+
+class FractionBackend(object):
+
+    name = 'fraction'
+
+    def __init__(self):
+        self.zero = Fraction(0)
+        self.one = Fraction(1)
+        # exact arithmetic, nothing is "near" zero except zero itself
+        self.eps = Fraction(0)
+        self.orthogonal_eps = Fraction(0)
+
+    def convert(self, x):
+        if isinstance(x, Fraction):
+            return x
+        return Fraction(x)
+
+    def sqrt(self, x):
+        # exact when numerator and denominator are perfect squares,
+        # otherwise the best we can do is the float square root
+        x = Fraction(x)
+        n = _isqrt(x.numerator)
+        d = _isqrt(x.denominator)
+        if n is not None and d is not None:
+            return Fraction(n, d)
+        return Fraction(sqrt(x))
+
+    def is_near_zero(self, x, eps=None):
+        if eps is None or eps == 0:
+            return x == 0
+        return abs(x) < eps
+
+    def local(self):
+        return _NO_CONTEXT
+
+    def __eq__(self, other):
+        return isinstance(other, FractionBackend)
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.name)
+
+    def __repr__(self):
+        return 'FractionBackend()'
+
+
+def _isqrt(n):
+    # integer square root if n is a perfect square, else None
+    if n < 0:
+        return None
+    r = int(sqrt(n))
+    while r * r > n:
+        r -= 1
+    while (r + 1) * (r + 1) <= n:
+        r += 1
+    if r * r == n:
+        return r
+    return None
+
+
+BACKENDS = {
+    'float': FloatBackend,
+    'float64': FloatBackend,
+    'decimal': DecimalBackend,
+    'fraction': FractionBackend,
+}
+
+_default_backend = DecimalBackend(30)
+
+# one shared instance per backend class for the names, so that every
+# Vector made with 'float' (or 'float64') holds the same backend object
+_named_backends = {}
+
+
+def get_backend(backend=None):
+    if backend is None:
+        return _default_backend
+    if isinstance(backend, (FloatBackend, DecimalBackend, FractionBackend)):
+        return backend
+    try:
+        cls = BACKENDS[backend]
+    except KeyError:
+        raise ValueError('Unknown numeric backend: {}'.format(backend))
+    try:
+        return _named_backends[cls]
+    except KeyError:
+        return _named_backends.setdefault(cls, cls())
+
+
+def set_default_backend(backend):
+    global _default_backend
+    _default_backend = get_backend(backend)
+    return _default_backend
@@ -0,0 +1,172 @@
+import numpy as np
+
+from vectorarray import VectorArray
+from numeric import FloatBackend
+
+
+# Orthonormal basis of a set of vectors, with all the vectors stacked in one
+# array instead of one Vector.component_orthogonal_to per pair. Both methods
+# go through the vectors in blocks of block_size, so most of the work is done
+# by matrix-matrix products on a block instead of a pass over all the vectors
+# for every new direction.
+#
+#   gram_schmidt      modified Gram-Schmidt, reorthogonalize=True projects
+#                     every vector twice ("twice is enough") for the
+#                     orthogonality that a single pass loses on nearly
+#                     dependent vectors
+#   householder_qr    Householder reflections, orthogonal to machine
+#                     precision whatever the vectors are
+#
+# A vector whose component orthogonal to the basis found so far is near zero
+# (below eps, FloatBackend.eps by default) adds no direction, it is dependent.
+
+
+class QRFactorization(object):
+
+    # basis is a VectorArray of rank orthonormal vectors (None for rank 0),
+    # r the rank x N array of coefficients, vector j = sum_i r[i, j] basis[i].
+    # r is in echelon form: row i starts at column independent[i], the
+    # vectors that added a new direction, with a positive entry. dependent
+    # are the others
+
+    def __init__(self, basis, r, independent, num_vectors):
+        self.basis = basis
+        self.r = r
+        self.independent = independent
+        independent = set(independent)
+        self.dependent = [j for j in range(num_vectors) if j not in independent]
+
+    @property
+    def rank(self):
+        return len(self.independent)
+
+    def is_full_rank(self):
+        return not self.dependent
+
+    def __str__(self):
+        return 'QR factorization: rank {} of {} vectors'.format(
+            self.rank, self.rank + len(self.dependent))
+
+
+def _stacked(vectors):
+    if isinstance(vectors, VectorArray):
+        return vectors
+    if isinstance(vectors, np.ndarray):
+        return VectorArray(vectors)
+    return VectorArray.from_vectors(vectors)
+
+
+def _basis(rows):
+    # a VectorArray can't be empty, no basis at all when every vector is zero
+    return VectorArray(rows) if len(rows) else None
+
+
+def gram_schmidt(vectors, reorthogonalize=False, eps=FloatBackend.eps, block_size=64):
+    vectors = _stacked(vectors)
+    work = np.array(vectors.coordinates)
+    n, d = work.shape
+    basis = np.empty((min(n, d), d))
+    r = np.zeros((min(n, d), n))
+    independent = []
+    rank = 0
+    passes = 2 if reorthogonalize else 1
+
+    for start in range(0, n, block_size):
+        stop = min(n, start + block_size)
+        block = work[start:stop]
+
+        # the directions of the earlier blocks, all at once
+        for _ in range(passes):
+            if rank:
+                c = block.dot(basis[:rank].T)
+                block -= c.dot(basis[:rank])
+                r[:rank, start:stop] += c.T
+
+        # modified Gram-Schmidt inside the block: every new direction is
+        # taken out of the rest of the block right away
+        block_rank = rank
+        for k in range(stop - start):
+            j = start + k
+            v = block[k]
+            if reorthogonalize and rank > block_rank:
+                c = basis[block_rank:rank].dot(v)
+                v -= c.dot(basis[block_rank:rank])
+                r[block_rank:rank, j] += c
+            norm = np.sqrt(v.dot(v))
+            if norm < eps or rank == d:
+                continue
+            q = v / norm
+            basis[rank] = q
+            r[rank, j] = norm
+            rest = block[k+1:]
+            if len(rest):
+                c = rest.dot(q)
+                rest -= np.outer(c, q)
+                r[rank, j+1:stop] = c
+            independent.append(j)
+            rank += 1
+
+    return QRFactorization(_basis(basis[:rank]), r[:rank], independent, n)
+
+
+def householder_qr(vectors, eps=FloatBackend.eps, block_size=32):
+    # the vectors are the columns of A (d x N) and Q^T A = R is built one
+    # reflection at a time inside a block of columns, the block's
+    # reflections are then applied to the remaining columns together as
+    # I - V T V^T (compact WY, like LAPACK). Like the echelon form of
+    # LinearSystem the row of the next reflection only moves on when a
+    # column adds a new direction
+    vectors = _stacked(vectors)
+    a = np.array(vectors.coordinates.T)
+    d, n = a.shape
+    blocks = []
+    independent = []
+    rank = 0
+
+    for start in range(0, n, block_size):
+        stop = min(n, start + block_size)
+        panel = a[:, start:stop]
+        vs = []
+        taus = []
+        for k in range(stop - start):
+            if rank == d:
+                break
+            x = panel[rank:, k]
+            alpha = np.sqrt(x.dot(x))
+            if alpha < eps:
+                continue
+            v = x.copy()
+            v[0] += alpha if x[0] >= 0 else -alpha
+            tau = 2. / v.dot(v)
+            rest = panel[rank:, k:]
+            rest -= tau * np.outer(v, v.dot(rest))
+
+            full = np.zeros(d)
+            full[rank:] = v
+            vs.append(full)
+            taus.append(tau)
+            independent.append(start + k)
+            rank += 1
+
+        if vs:
+            v = np.array(vs).T
+            t = np.zeros((len(vs), len(vs)))
+            for i, tau in enumerate(taus):
+                t[i, i] = tau
+                if i:
+                    t[:i, i] = -tau * t[:i, :i].dot(v[:, :i].T.dot(v[:, i]))
+            trailing = a[:, stop:]
+            if trailing.size:
+                trailing -= v.dot(t.T.dot(v.T.dot(trailing)))
+            blocks.append((v, t))
+
+    # Q = H_1 ... H_rank applied to the first rank columns of the identity
+    q = np.eye(d, rank)
+    for v, t in reversed(blocks):
+        q -= v.dot(t.dot(v.T.dot(q)))
+    r = a[:rank]
+    r[np.arange(n)[None, :] < np.array(independent, dtype=int)[:, None]] = 0.
+
+    # same signs as Gram-Schmidt, positive where each row starts
+    signs = np.sign(r[np.arange(rank), independent])
+    return QRFactorization(_basis(q.T * signs[:, None]), r * signs[:, None], independent, n)
@@ -0,0 +1,202 @@
+import numpy as np
+
+from vector import Vector
+from plane import Plane
+from vectorarray import VectorArray
+from numeric import FloatBackend
+
+
+# status of a triple of planes, like the verdicts of
+# LinearSystem.compute_solution() for a 3 x 3 system
+UNIQUE = 0
+NO_SOLUTIONS = 1
+INF_SOLUTIONS = 2
+
+# status of a plane and a line
+INTERSECTING = 0
+PARALLEL = 1
+CONTAINED = 2
+
+
+class PlaneArray(object):
+
+    # N planes n . x = k in 3 dimensions packed as an N x 3 float64 array of
+    # normal vectors and an array of N constant terms. Intersections are
+    # closed form, Cramer's rule written with cross products, so a vertex
+    # costs a few multiplications instead of a LinearSystem elimination
+
+    def __init__(self, normals, constants, eps=FloatBackend.eps):
+        self.normals = np.ascontiguousarray(normals, dtype=np.float64).reshape(-1, 3)
+        self.constants = np.ascontiguousarray(constants, dtype=np.float64).reshape(-1)
+        if len(self.normals) != len(self.constants):
+            raise ValueError('Need one constant term per plane')
+        self.eps = eps
+
+    @classmethod
+    def from_planes(cls, planes, eps=FloatBackend.eps):
+        planes = list(planes)
+        normals = np.array([[float(x) for x in p.normal_vector.coordinates] for p in planes])
+        constants = np.array([float(p.constant_term) for p in planes])
+        return cls(normals, constants, eps)
+
+    def to_planes(self, backend='float'):
+        return [Plane(Vector(n, backend), k, backend)
+                for n, k in zip(self.normals.tolist(), self.constants.tolist())]
+
+    def __len__(self):
+        return len(self.constants)
+
+    def __getitem__(self, i):
+        # a PlaneArray of the selected planes, i is a slice or index array
+        return PlaneArray(self.normals[i], self.constants[i], self.eps)
+
+    def magnitudes(self):
+        return np.sqrt(np.einsum('ij,ij->i', self.normals, self.normals))
+
+    def _points(self, points):
+        points = np.asarray(points, dtype=np.float64)
+        if points.ndim == 1:
+            points = points.reshape(1, -1)
+        if points.ndim != 2 or points.shape[1] != 3:
+            raise ValueError(VectorArray.LENGTH_NOT_EQUAL_MSG)
+        return points
+
+    def iter_distances(self, points, chunk_size=1 << 20, signed=True):
+        # yield (start, block): block[a, b] is the distance from
+        # points[start + a] to plane b, positive on the side the normal
+        # vector points to. Blocks have about chunk_size entries, a zero
+        # normal vector gives nan
+        points = self._points(points)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scale = 1. / self.magnitudes()
+        scale[~np.isfinite(scale)] = np.nan
+        block = max(1, chunk_size // max(len(self), 1))
+        for start in range(0, len(points), block):
+            distances = points[start:start + block].dot(self.normals.T)
+            distances -= self.constants
+            distances *= scale
+            if not signed:
+                np.abs(distances, out=distances)
+            yield start, distances
+
+    def distances(self, points, signed=True):
+        # the whole len(points) x len(self) distance matrix
+        blocks = [d for start, d in self.iter_distances(points, signed=signed)]
+        if not blocks:
+            return np.empty((0, len(self)))
+        return np.concatenate(blocks)
+
+    def iter_sides(self, points, chunk_size=1 << 20):
+        # like iter_distances but block[a, b] is 1 / -1 on the positive /
+        # negative side and 0 on the plane, within eps like is_near_zero
+        for start, distances in self.iter_distances(points, chunk_size):
+            sides = np.sign(distances).astype(np.int8)
+            sides[np.abs(distances) < self.eps] = 0
+            yield start, sides
+
+    def sides(self, points):
+        blocks = [s for start, s in self.iter_sides(points)]
+        if not blocks:
+            return np.empty((0, len(self)), dtype=np.int8)
+        return np.concatenate(blocks)
+
+    def on_planes(self, points):
+        # mask, point a lies on plane b
+        return self.sides(points) == 0
+
+    def contains(self, points, chunk_size=1 << 16):
+        # mask of the points inside all the half-spaces n . x <= k (within
+        # eps), i.e. inside the convex polytope. The planes are tested one
+        # at a time on the points that are still inside, so a block stops as
+        # soon as every point of it has been ruled out
+        points = self._points(points)
+        inside = np.zeros(len(points), dtype=bool)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tolerance = self.eps * self.magnitudes()
+        for start in range(0, len(points), chunk_size):
+            candidates = np.arange(start, min(start + chunk_size, len(points)))
+            block = points[candidates]
+            for b in range(len(self)):
+                keep = block.dot(self.normals[b]) - self.constants[b] <= tolerance[b]
+                if not keep.all():
+                    candidates = candidates[keep]
+                    block = block[keep]
+                    if not len(candidates):
+                        break
+            inside[candidates] = True
+        return inside
+
+    def intersect_triples(self, first, second, third):
+        # intersect planes first[m], second[m] and third[m] for every m,
+        # returns (status, points), points[m] is (nan, nan, nan) unless
+        # status[m] is UNIQUE
+        return intersect_three_planes(self[first], self[second], self[third])
+
+    def intersect_lines(self, basepoints, directions):
+        return intersect_planes_lines(self, basepoints, directions)
+
+
+def intersect_three_planes(p1, p2, p3):
+    # p1, p2 and p3 are PlaneArrays of the same length (or length 1, which
+    # is used for every triple). With c_1 = n_2 x n_3, c_2 = n_3 x n_1 and
+    # c_3 = n_1 x n_2 the point is (k_1 c_1 + k_2 c_2 + k_3 c_3) / (n_1 . c_1)
+    eps = p1.eps
+    size = max(len(p1), len(p2), len(p3))
+    if any(len(p) not in (1, size) for p in (p1, p2, p3)):
+        raise ValueError(VectorArray.LENGTH_NOT_EQUAL_MSG)
+    n1, n2, n3 = [VectorArray(np.broadcast_to(p.normals, (size, 3))) for p in (p1, p2, p3)]
+    k1, k2, k3 = [np.broadcast_to(p.constants, (size,)) for p in (p1, p2, p3)]
+
+    c1 = n2.cross(n3)
+    c2 = n3.cross(n1)
+    c3 = n1.cross(n2)
+    det = n1.dot(c1)
+    numerator = (k1[:, None] * c1.coordinates +
+                 k2[:, None] * c2.coordinates +
+                 k3[:, None] * c3.coordinates)
+    singular = np.abs(det) < eps
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        points = numerator / det[:, None]
+    points[singular] = np.nan
+
+    status = np.full(size, UNIQUE, dtype=np.int8)
+    if singular.any():
+        # the few degenerate triples: no solution or a line / plane of them,
+        # compare the rank of the coefficients with that of the augmented rows
+        m = np.nonzero(singular)[0]
+        a = np.stack([n.coordinates[m] for n in (n1, n2, n3)], axis=1)
+        k = np.stack([c[m] for c in (k1, k2, k3)], axis=1)
+        augmented = np.concatenate([a, k[:, :, None]], axis=2)
+        rank_a = (np.linalg.svd(a, compute_uv=False) >= eps).sum(axis=1)
+        rank_aug = (np.linalg.svd(augmented, compute_uv=False) >= eps).sum(axis=1)
+        status[m] = np.where(rank_a == rank_aug, INF_SOLUTIONS, NO_SOLUTIONS)
+    return status, points
+
+
+def intersect_planes_lines(planes, basepoints, directions):
+    # the line basepoints[m] + t directions[m] against planes[m] (either side
+    # can have length 1), returns (status, points, t), points[m] and t[m] are
+    # nan unless status[m] is INTERSECTING
+    eps = planes.eps
+    p = np.asarray(basepoints, dtype=np.float64).reshape(-1, 3)
+    u = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+    size = max(len(planes), len(p), len(u))
+    if any(length not in (1, size) for length in (len(planes), len(p), len(u))):
+        raise ValueError(VectorArray.LENGTH_NOT_EQUAL_MSG)
+    normals = np.broadcast_to(planes.normals, (size, 3))
+
+    # n . (p + t u) = k
+    along = np.einsum('ij,ij->i', normals, np.broadcast_to(u, (size, 3)))
+    gap = planes.constants - np.einsum('ij,ij->i', normals, np.broadcast_to(p, (size, 3)))
+    gap = np.broadcast_to(gap, (size,))
+    parallel = np.abs(along) < eps
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = gap / along
+    t[parallel] = np.nan
+    points = np.broadcast_to(p, (size, 3)) + t[:, None] * u
+
+    status = np.full(size, INTERSECTING, dtype=np.int8)
+    status[parallel] = np.where(np.abs(gap[parallel]) < eps, CONTAINED, PARALLEL)
+    return status, points, t
@@ -0,0 +1,169 @@
+import numpy as np
+
+from vector import Vector
+from numeric import get_backend, DecimalBackend, FloatBackend
+
+
+# Mixed precision solve: the system is factorized once in float64 (P A = L U
+# with numpy, O(n^3) at machine speed), every step computes the residual
+# r = b - A x in Decimal (or exactly, with Fractions), solves A d = r with the
+# float factors (O(n^2)) and adds the correction to x, which is kept in the
+# high precision type. Each step gains about as many digits as float64 has
+# left after the condition number, so a reasonably conditioned system reaches
+# Decimal accuracy in a few steps. When the residual stops going down the
+# system is too ill-conditioned for that and the solve falls back to the
+# full elimination of LinearSystem.compute_solution(). A pivot below
+# FloatBackend.eps (relative to the largest coefficient) can't tell an
+# ill-conditioned system from a singular one whose equations happen to be
+# consistent, so a solution found with such a pivot is only reported unique
+# after the exact rank (BareissElimination) is checked.
+
+
+class RefinedSolution(object):
+
+    # verdict is one of the LinearSystem verdicts and point the solution
+    # Vector (in the high precision backend) when it is unique. steps is the
+    # number of refinement steps, residual the max norm of b - A x of the
+    # final point and fell_back whether the Decimal elimination was needed
+    # (solution is then its Solution)
+
+    def __init__(self, verdict, point, steps, residual, fell_back=False, solution=None):
+        self.verdict = verdict
+        self.point = point
+        self.steps = steps
+        self.residual = residual
+        self.fell_back = fell_back
+        self.solution = solution
+
+    def __str__(self):
+        ret = 'Refined solution: {} steps={} residual={}'.format(
+            self.verdict, self.steps, self.residual)
+        if self.fell_back:
+            ret += ' (Decimal elimination)'
+        if self.point is not None:
+            ret += ' {}'.format(self.point)
+        return ret
+
+
+def lu_factor(a):
+    # P A = L U with partial pivoting, L and U packed in one array like
+    # LAPACK's getrf, permutation[i] is the row of A that ended up in row i.
+    # Returns None when a pivot is zero or not finite (singular in float64).
+    # A tiny pivot is kept: an ill-conditioned system still refines, and one
+    # that float64 can't handle is caught when the residual stops going down
+    lu = np.array(a, dtype=np.float64)
+    n = lu.shape[0]
+    permutation = np.arange(n)
+    for k in range(n):
+        p = k + np.argmax(np.abs(lu[k:, k]))
+        if lu[p, k] == 0 or not np.isfinite(lu[p, k]):
+            return None
+        if p != k:
+            lu[[k, p]] = lu[[p, k]]
+            permutation[[k, p]] = permutation[[p, k]]
+        lu[k+1:, k] /= lu[k, k]
+        lu[k+1:, k+1:] -= np.outer(lu[k+1:, k], lu[k, k+1:])
+    return lu, permutation
+
+
+def lu_solve(factors, b):
+    lu, permutation = factors
+    y = np.asarray(b, dtype=np.float64)[permutation]
+    n = len(y)
+    # forward substitution with the unit lower triangle, then back
+    for i in range(1, n):
+        y[i] -= lu[i, :i].dot(y[:i])
+    for i in range(n - 1, -1, -1):
+        y[i] = (y[i] - lu[i, i+1:].dot(y[i+1:])) / lu[i, i]
+    return y
+
+
+def _high_precision_backend(system, exact):
+    if exact:
+        return get_backend('fraction')
+    if isinstance(system.backend, DecimalBackend):
+        return system.backend
+    return get_backend('decimal')
+
+
+def refine_solve(system, tol=None, max_steps=10, exact=False):
+    from linsys import LinearSystem, BareissElimination
+
+    backend = _high_precision_backend(system, exact)
+    convert = backend.convert
+    if tol is None:
+        tol = _default_tolerance(backend)
+    tol = convert(tol)
+
+    rows = system._dense_snapshot()._rows
+    n = system.dimension
+    hp_rows = [[convert(x) for x in row] for row in rows]
+
+    factors = None
+    if len(rows) == n:
+        a = np.array([[float(x) for x in row[:-1]] for row in rows])
+        factors = lu_factor(a)
+    if factors is not None:
+        scale = np.abs(a).max()
+        near_singular = np.abs(np.diagonal(factors[0])).min() < FloatBackend.eps * scale
+
+    steps = 0
+    residual = None
+    if factors is not None:
+        with backend.local():
+            b_norm = max(abs(row[-1]) for row in hp_rows)
+            a_norm = max(sum(abs(x) for x in row[:-1]) for row in hp_rows)
+
+            def residuals(x):
+                return [row[-1] - sum(a*xj for a, xj in zip(row[:-1], x) if a) for row in hp_rows]
+
+            x = [backend.zero] * n
+            r = [row[-1] for row in hp_rows]
+            residual = max(abs(ri) for ri in r)
+            while True:
+                x_norm = max(abs(xj) for xj in x)
+                if residual <= tol * (a_norm * x_norm + b_norm):
+                    if near_singular and BareissElimination(system).rank < n:
+                        break
+                    point = Vector(x, backend)
+                    return RefinedSolution(LinearSystem.UNIQUE_SOLUTION, point, steps, residual)
+                if steps == max_steps:
+                    break
+
+                d = lu_solve(factors, [float(ri) for ri in r])
+                if not np.all(np.isfinite(d)):
+                    break
+                # repr() is the shortest exact string of the float, Decimal
+                # and Fraction both read it without rounding
+                x = [xj + convert(repr(dj)) for xj, dj in zip(x, d.tolist())]
+                steps += 1
+
+                r = residuals(x)
+                new_residual = max(abs(ri) for ri in r)
+                if steps > 1 and new_residual > residual / 2:
+                    # not converging, too ill-conditioned for float64
+                    residual = new_residual
+                    break
+                residual = new_residual
+
+    # not square, singular in float64 or not converging: full elimination
+    if system.backend == backend:
+        solution = system.compute_solution()
+    else:
+        solution = LinearSystem._from_rows(hp_rows, n, backend).compute_solution()
+    if solution.point is not None:
+        with backend.local():
+            x = solution.point.coordinates
+            residual = max(abs(row[-1] - sum(a*xj for a, xj in zip(row[:-1], x) if a))
+                           for row in hp_rows)
+    return RefinedSolution(solution.verdict, solution.point, steps, residual, True, solution)
+
+
+def _default_tolerance(backend):
+    # a few units in the last place of the Decimal precision, exact
+    # residuals aim for the same as the default Decimal backend
+    if isinstance(backend, DecimalBackend):
+        prec = backend.prec
+    else:
+        prec = get_backend('decimal').prec
+    return backend.convert(10) ** -(prec - 3)
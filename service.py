@@ -0,0 +1,296 @@
+import os
+import sys
+import json
+import time
+import Queue
+import socket
+import argparse
+import threading
+import SocketServer
+from collections import deque
+
+from batch import parse_system, format_solution
+
+
+# Local solver service, one warm process that many clients share:
+#
+#   python service.py --unix /tmp/linsys.sock --workers 4
+#   python service.py --port 8765             # TCP, on 127.0.0.1 only
+#
+# A client sends one system per line in the format of batch.py and gets one
+# JSON line back per system, in the same order (requests can be pipelined):
+# {"id": ..., "verdict": ...} plus "solution" or "parametrization"
+# {"basepoint": [...], "directions": [[...], ...]}, or {"id": ..., "error": ...}.
+# The line {"metrics": true} answers with the service metrics instead.
+#
+# Requests from all connections go into one bounded queue. A dispatcher
+# takes the first waiting request, gathers whatever else arrives within
+# batch_window seconds (up to max_batch) and solves the batch at once, on
+# a process pool when workers > 1. When max_pending requests are already
+# waiting a connection blocks for at most queue_timeout seconds, then the
+# request is answered with the "overloaded" error, so clients slow down
+# instead of the queue growing without end.
+#
+# Python 2 has no asyncio, the connections are threads (SocketServer) and
+# the batching runs in one dispatcher thread.
+
+OVERLOADED_MSG = 'overloaded'
+LATENCY_SAMPLES = 10000
+
+
+def _solve(system):
+    # module level so that the process pool can pickle it, the result is
+    # formatted in the worker so only a small dict comes back
+    return format_solution(None, system.compute_solution(), with_parametrization=True)
+
+
+class _Request(object):
+
+    def __init__(self, eq_id, system):
+        self.id = eq_id
+        self.system = system
+        self.result = None
+        self.received = time.time()
+        self.done = threading.Event()
+
+    def finish(self, result):
+        result['id'] = self.id
+        self.result = result
+        self.done.set()
+
+
+class ServiceMetrics(object):
+
+    # counters and the latencies (seconds from receiving a request to its
+    # result) of the last LATENCY_SAMPLES requests
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.rejected = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_requests = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
+    def record_batch(self, requests):
+        now = time.time()
+        with self.lock:
+            self.batches += 1
+            self.batched_requests += len(requests)
+            self.latencies.extend(now - r.received for r in requests)
+
+    def count(self, name):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def percentile(self, q):
+        with self.lock:
+            samples = sorted(self.latencies)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q / 100. * len(samples)))]
+
+    def as_dict(self, pending=0):
+        return {
+            'requests': self.requests,
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'batches': self.batches,
+            'mean_batch_size': self.batched_requests / float(self.batches) if self.batches else 0.,
+            'pending': pending,
+            'latency_p50': self.percentile(50),
+            'latency_p90': self.percentile(90),
+            'latency_p99': self.percentile(99),
+        }
+
+
+class SolverService(object):
+
+    def __init__(self, workers=1, batch_window=0.005, max_batch=256, max_pending=1024,
+                 queue_timeout=1., backend=None):
+        self.workers = workers
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.queue_timeout = queue_timeout
+        self.backend = backend
+        self.metrics = ServiceMetrics()
+        self._queue = Queue.Queue(max_pending)
+        self._pool = None
+        self._dispatcher = None
+        self._server = None
+        self._unix_path = None
+        self._running = False
+
+    def start(self):
+        # start the worker pool and the dispatcher, serve() or submit() after
+        if self.workers > 1:
+            from multiprocessing import Pool
+            self._pool = Pool(self.workers)
+        self._running = True
+        self._dispatcher = threading.Thread(target=self._dispatch)
+        self._dispatcher.daemon = True
+        self._dispatcher.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._unix_path is not None:
+            os.unlink(self._unix_path)
+            self._unix_path = None
+        if self._dispatcher is not None:
+            self._dispatcher.join()
+            self._dispatcher = None
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def submit(self, line):
+        # queue one request line, returns the _Request to wait on, or a dict
+        # right away for a line that can't be queued
+        self.metrics.count('requests')
+        try:
+            data = json.loads(line)
+            if isinstance(data, dict) and data.get('metrics'):
+                return self.metrics.as_dict(self._queue.qsize())
+            eq_id, system = parse_system(line, self.backend)
+        except Exception as e:
+            self.metrics.count('errors')
+            return {'id': None, 'error': str(e) or e.__class__.__name__}
+
+        request = _Request(eq_id, system)
+        try:
+            self._queue.put(request, timeout=self.queue_timeout)
+        except Queue.Full:
+            self.metrics.count('rejected')
+            return {'id': eq_id, 'error': OVERLOADED_MSG}
+        return request
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except Queue.Empty:
+            return []
+        deadline = time.time() + self.batch_window
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except Queue.Empty:
+                break
+        return batch
+
+    def _dispatch(self):
+        while self._running or not self._queue.empty():
+            batch = self._next_batch()
+            if not batch:
+                continue
+            systems = [r.system for r in batch]
+            try:
+                if self._pool is not None and len(batch) > 1:
+                    results = self._pool.map(_solve, systems)
+                else:
+                    results = [_solve(s) for s in systems]
+            except Exception:
+                # one bad system fails the pool map, solve them one by one
+                results = []
+                for s in systems:
+                    try:
+                        results.append(_solve(s))
+                    except Exception as e:
+                        self.metrics.count('errors')
+                        results.append({'error': str(e) or e.__class__.__name__})
+            for request, result in zip(batch, results):
+                request.finish(result)
+            self.metrics.record_batch(batch)
+
+    def serve(self, address):
+        # address is a path for a Unix socket or a port on 127.0.0.1,
+        # blocks until stop() is called from another thread
+        service = self
+
+        class Handler(SocketServer.StreamRequestHandler):
+
+            def handle(self):
+                # a reader (this thread) and a writer, so one connection can
+                # have many requests in the same batch
+                pending = Queue.Queue()
+                writer = threading.Thread(target=self._write, args=(pending,))
+                writer.start()
+                try:
+                    for line in self.rfile:
+                        if line.strip():
+                            pending.put(service.submit(line))
+                finally:
+                    pending.put(None)
+                    writer.join()
+
+            def _write(self, pending):
+                while True:
+                    request = pending.get()
+                    if request is None:
+                        return
+                    if isinstance(request, _Request):
+                        request.done.wait()
+                        result = request.result
+                    else:
+                        result = request
+                    try:
+                        self.wfile.write(json.dumps(result, sort_keys=True) + '\n')
+                        self.wfile.flush()
+                    except socket.error:
+                        pass
+
+        if isinstance(address, int):
+            server_class = _ThreadingTCPServer
+            address = ('127.0.0.1', address)
+        else:
+            server_class = _ThreadingUnixServer
+            self._unix_path = address
+        self._server = server_class(address, Handler)
+        self._server.serve_forever()
+
+
+class _ThreadingTCPServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _ThreadingUnixServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve linear system solves on a local socket')
+    where = parser.add_mutually_exclusive_group(required=True)
+    where.add_argument('--unix', default=None, help='path of the Unix socket')
+    where.add_argument('--port', type=int, default=None, help='TCP port on 127.0.0.1')
+    parser.add_argument('--workers', type=int, default=1, help='solver processes (default 1)')
+    parser.add_argument('--window-ms', type=float, default=5.,
+                        help='how long a batch waits for more requests')
+    parser.add_argument('--max-batch', type=int, default=256)
+    parser.add_argument('--max-pending', type=int, default=1024,
+                        help='queued requests before connections are held back')
+    parser.add_argument('--backend', default=None, choices=['float', 'decimal', 'fraction'])
+    args = parser.parse_args(argv)
+
+    service = SolverService(args.workers, args.window_ms / 1000., args.max_batch,
+                            args.max_pending, backend=args.backend).start()
+    try:
+        service.serve(args.unix if args.unix else args.port)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,348 @@
+from heapq import heapify, heappush, heappop
+
+from vector import Vector
+from linsys import LinearSystem, make_hyperplane
+from numeric import get_backend
+
+
+class SparseLinearSystem(LinearSystem):
+
+    # same interface as LinearSystem, but every equation is stored as
+    # [{column: coefficient}, constant] with only the nonzero coefficients,
+    # so memory and elimination work follow the number of nonzeros and not n^2.
+    # Elimination picks its pivots with the Markowitz criterion, the entry
+    # with the smallest (row count - 1) * (column count - 1), to keep fill-in low
+
+    # a pivot must be at least this fraction of the largest entry in its
+    # column (threshold pivoting), so sparsity doesn't cost all the stability
+    PIVOT_THRESHOLD = 0.1
+    # how many of the sparsest columns are searched for the next pivot
+    PIVOT_SEARCH_COLUMNS = 4
+
+    def __init__(self, planes, backend=None):
+        LinearSystem.__init__(self, planes, backend)
+        self._pivots = None
+
+    @classmethod
+    def from_rows(cls, rows, constants, dimension=None, backend=None):
+        # rows can be dicts {column: coefficient} or dense sequences,
+        # the dimension can only be left out for dense rows
+        if dimension is None:
+            if not rows or isinstance(rows[0], dict):
+                raise ValueError('The dimension is needed for dict rows')
+            dimension = len(rows[0])
+        backend = get_backend(backend)
+        convert = backend.convert
+        sparse_rows = []
+        for row, k in zip(rows, constants):
+            if isinstance(row, dict):
+                items = row.items()
+            else:
+                items = enumerate(row)
+            coefficients = {}
+            for j, x in items:
+                if not 0 <= j < dimension:
+                    raise IndexError('Column {} is outside of dimension {}'.format(j, dimension))
+                x = convert(x)
+                if x != 0:
+                    coefficients[j] = x
+            sparse_rows.append([coefficients, convert(k)])
+        return cls._from_rows(sparse_rows, dimension, backend)
+
+    @classmethod
+    def _from_rows(cls, rows, dimension, backend=None):
+        system = super(SparseLinearSystem, cls)._from_rows(rows, dimension, backend)
+        system._pivots = None
+        return system
+
+    def to_dense(self):
+        zero = self.backend.zero
+        rows = []
+        for coefficients, k in self._rows:
+            row = [zero] * (self.dimension + 1)
+            for j, x in coefficients.items():
+                row[j] = x
+            row[-1] = k
+            rows.append(row)
+        return LinearSystem._from_rows(rows, self.dimension, self.backend)
+
+    def to_sparse(self):
+        return self.snapshot()
+
+    def _dense_snapshot(self):
+        # factorize() runs the dense elimination
+        return self.to_dense()
+
+    def nnz(self):
+        return sum(len(r[0]) for r in self._rows)
+
+    def _row_from_plane(self, p):
+        convert = self.backend.convert
+        coefficients = {}
+        for j, x in enumerate(p.normal_vector.coordinates):
+            if x != 0:
+                coefficients[j] = convert(x)
+        return [coefficients, convert(p.constant_term)]
+
+    def snapshot(self):
+        system = LinearSystem.snapshot(self)
+        system._pivots = self._pivots
+        return system
+
+    def _writable_row(self, i):
+        # the row list and its dict are both shared after a snapshot
+        self._factorization = None
+        if not self._owned[i]:
+            coefficients, k = self._rows[i]
+            self._rows[i] = [dict(coefficients), k]
+            self._owned[i] = True
+        self._planes[i] = None
+        return self._rows[i]
+
+    def _row_items(self, i):
+        return sorted(self._rows[i][0].items())
+
+    def _subsystem(self, indices):
+        system = LinearSystem._subsystem(self, indices)
+        system._pivots = None
+        return system
+
+    def _coefficient(self, row, col):
+        return self._rows[row][0].get(col, self.backend.zero)
+
+    def _pivot_columns(self):
+        if self._pivots is not None:
+            return list(self._pivots)
+        return self.indices_of_first_nonzero_terms_in_each_row()
+
+    def swap_rows(self, row1, row2):
+        LinearSystem.swap_rows(self, row1, row2)
+        self._pivots = None
+
+    def multiply_coefficient_and_row(self, coefficient, row):
+        coefficient = self.backend.convert(coefficient)
+        r = self._writable_row(row)
+        with self.backend.local():
+            for j in r[0]:
+                r[0][j] = r[0][j] * coefficient
+            r[1] = r[1] * coefficient
+        self._pivots = None
+
+    def add_multiple_times_row_to_row(self, coefficient, row_to_add, row_to_be_added_to):
+        coefficient = self.backend.convert(coefficient)
+        is_near_zero = self.backend.is_near_zero
+        src = self._rows[row_to_add]
+        dst = self._writable_row(row_to_be_added_to)
+        with self.backend.local():
+            for j, x in src[0].items():
+                v = dst[0].get(j, self.backend.zero) + x * coefficient
+                if is_near_zero(v):
+                    dst[0].pop(j, None)
+                else:
+                    dst[0][j] = v
+            dst[1] = dst[1] + src[1] * coefficient
+        self._pivots = None
+
+    def _is_zero_row(self, row):
+        is_near_zero = self.backend.is_near_zero
+        for x in self._rows[row][0].values():
+            if not is_near_zero(x):
+                return False
+        return True
+
+    def indices_of_first_nonzero_terms_in_each_row(self):
+        is_near_zero = self.backend.is_near_zero
+        indices = []
+        for coefficients, k in self._rows:
+            nonzero = [j for j, x in coefficients.items() if not is_near_zero(x)]
+            indices.append(min(nonzero) if nonzero else -1)
+        return indices
+
+    def _eliminate(self, pivot_row, pivot_col, targets, col_rows):
+        # subtract a multiple of pivot_row from every target row so that
+        # pivot_col becomes zero there. col_rows (column -> rows with a
+        # nonzero there) is kept up to date with the fill-in and cancellations
+        is_near_zero = self.backend.is_near_zero
+        src = self._rows[pivot_row]
+        pivot = src[0][pivot_col]
+        for k in targets:
+            dst = self._writable_row(k)
+            coe = -dst[0][pivot_col] / pivot
+            for j, x in src[0].items():
+                if j == pivot_col:
+                    continue
+                old = dst[0].get(j)
+                if old is None:
+                    v = x * coe
+                else:
+                    v = old + x * coe
+                if is_near_zero(v):
+                    if old is not None:
+                        del dst[0][j]
+                        col_rows[j].discard(k)
+                else:
+                    dst[0][j] = v
+                    if old is None:
+                        col_rows.setdefault(j, set()).add(k)
+            del dst[0][pivot_col]
+            dst[1] = dst[1] + src[1] * coe
+
+    def _next_pivot(self, heap, col_rows):
+        # look at the few sparsest columns and return the (row, col) with the
+        # lowest Markowitz cost among the entries that pass the threshold.
+        # the heap holds (count, col), entries whose count is out of date
+        # are just dropped, an up to date one is pushed whenever a count changes
+        rows = self._rows
+        candidates = []
+        seen = set()
+        while heap and len(candidates) < self.PIVOT_SEARCH_COLUMNS:
+            count, j = heappop(heap)
+            s = col_rows.get(j)
+            if not s or count != len(s) or j in seen:
+                continue
+            seen.add(j)
+            candidates.append(j)
+
+        best = None
+        threshold = self.backend.convert(self.PIVOT_THRESHOLD)
+        for j in candidates:
+            s = col_rows[j]
+            col_max = max(abs(rows[i][0][j]) for i in s)
+            for i in s:
+                a = abs(rows[i][0][j])
+                if a < threshold * col_max:
+                    continue
+                cost = (len(rows[i][0]) - 1) * (len(s) - 1)
+                if best is None or cost < best[0] or (cost == best[0] and a > best[1]):
+                    best = (cost, a, i, j)
+
+        for j in candidates:
+            heappush(heap, (len(col_rows[j]), j))
+
+        if best is None:
+            return None
+        return best[2], best[3]
+
+    def compute_triangular_form(self, in_place=False):
+        if in_place:
+            system = self
+        else:
+            system = self.snapshot()
+        rows = system._rows
+
+        # col_rows only counts the rows that don't have a pivot yet
+        col_rows = {}
+        for i, (coefficients, k) in enumerate(rows):
+            for j in coefficients:
+                col_rows.setdefault(j, set()).add(i)
+        heap = [(len(s), j) for j, s in col_rows.items()]
+        heapify(heap)
+
+        order = []
+        remaining = set(range(len(rows)))
+        with system.backend.local():
+            while True:
+                pivot = system._next_pivot(heap, col_rows)
+                if pivot is None:
+                    break
+                r, c = pivot
+                order.append(pivot)
+                remaining.remove(r)
+                for j in rows[r][0]:
+                    col_rows[j].discard(r)
+
+                system._eliminate(r, c, col_rows.pop(c), col_rows)
+
+                for j in rows[r][0]:
+                    if j == c:
+                        continue
+                    if col_rows.get(j):
+                        heappush(heap, (len(col_rows[j]), j))
+                    else:
+                        col_rows.pop(j, None)
+
+        # pivot rows first, in the order they were picked, then the 0 = k rows
+        permutation = [r for r, c in order] + sorted(remaining)
+        system._permute(permutation)
+        system._pivots = [c for r, c in order] + [-1] * len(remaining)
+        return system
+
+    def compute_rref(self, in_place=False):
+        tf = self.compute_triangular_form(in_place)
+        rows = tf._rows
+        pivots = tf._pivots
+        num_pivots = len([c for c in pivots if c != -1])
+        one = tf.backend.one
+
+        with tf.backend.local():
+            # all coefficient of pivot become 1
+            for t in range(num_pivots):
+                row = tf._writable_row(t)
+                coe = one / row[0][pivots[t]]
+                for j in row[0]:
+                    row[0][j] = row[0][j] * coe
+                row[1] = row[1] * coe
+                row[0][pivots[t]] = one
+
+            # after the forward pass a pivot column can only be left in the
+            # rows above its pivot row, clear them starting from the last pivot
+            col_rows = {}
+            for t in range(num_pivots):
+                for j in rows[t][0]:
+                    if j != pivots[t]:
+                        col_rows.setdefault(j, set()).add(t)
+            for t in range(num_pivots - 1, -1, -1):
+                targets = col_rows.pop(pivots[t], None)
+                if targets:
+                    tf._eliminate(t, pivots[t], targets, col_rows)
+
+        # sort the pivot rows by pivot column, like a dense rref
+        permutation = sorted(range(num_pivots), key=lambda t: pivots[t])
+        permutation += list(range(num_pivots, len(rows)))
+        tf._permute(permutation)
+        tf._pivots = sorted(pivots[:num_pivots]) + [-1] * (len(rows) - num_pivots)
+        return tf
+
+    def _permute(self, permutation):
+        self._rows = [self._rows[i] for i in permutation]
+        self._owned = [self._owned[i] for i in permutation]
+        self._planes = [self._planes[i] for i in permutation]
+
+    def __getitem__(self, i):
+        p = self._planes[i]
+        if p is None:
+            coefficients, k = self._rows[i]
+            coordinates = [self.backend.zero] * self.dimension
+            for j, x in coefficients.items():
+                coordinates[j] = x
+            p = make_hyperplane(Vector(coordinates, self.backend), k, self.backend)
+            self._planes[i] = p
+        return p
+
+    def __setitem__(self, i, x):
+        LinearSystem.__setitem__(self, i, x)
+        self._pivots = None
+
+    @property
+    def planes(self):
+        return LinearSystem.planes.fget(self)
+
+    @planes.setter
+    def planes(self, planes):
+        LinearSystem.planes.fset(self, planes)
+        self._pivots = None
+
+    def __getstate__(self):
+        state = LinearSystem.__getstate__(self)
+        state['_pivots'] = self._pivots
+        return state
+
+    def __str__(self):
+        # write the nonzero terms ourselves, no dense Hyperplane per row
+        ret = 'Sparse Linear System:\n'
+        temp = []
+        for i, (coefficients, k) in enumerate(self._rows):
+            terms = ['{}x_{}'.format(round(coefficients[j], 3), j+1) for j in sorted(coefficients)]
+            temp.append('Equation {}: {} = {}'.format(i+1, ' + '.join(terms) or '0', round(k, 3)))
+        ret += '\n'.join(temp)
+        return ret
@@ -0,0 +1,247 @@
+import json
+import struct
+from decimal import Decimal
+from fractions import Fraction
+
+import numpy as np
+
+from vector import Vector
+from numeric import get_backend, DecimalBackend, FloatBackend
+
+
+# Binary files for systems of equations and sets of vectors, loaded with
+# numpy.memmap so nothing is read (or converted) until it is used.
+#
+#   MAGIC            8 bytes, 'LINALG' + format version (1)
+#   header length    uint32, little endian
+#   header           JSON, padded with spaces so the data starts at a
+#                    multiple of ALIGNMENT bytes:
+#                    {"kind": "system" | "planes" | "vectors",
+#                     "backend": "float" | "decimal" | "fraction",
+#                     "prec": 30 (decimal only), "rows": m, "dimension": n,
+#                     "dtype": the numpy dtype of every entry}
+#   coefficients     m x n entries, C order
+#   constants        m entries (not there for "vectors")
+#
+# The dtype follows the numeric backend:
+#   float     '<f8'
+#   decimal   'S<width>', the exact decimal string of every entry
+#   fraction  int64 numerator and denominator ('num', 'den') when they all
+#             fit, otherwise 'S<width>' strings 'n/d'
+
+MAGIC = b'LINALG\x00\x01'
+ALIGNMENT = 64
+_LENGTH = struct.Struct('<I')
+_RATIONAL = np.dtype([('num', '<i8'), ('den', '<i8')])
+_INT64_MAX = 2 ** 63 - 1
+
+
+def _encode(values, backend):
+    # one flat numpy array of the entries for the backend's dtype
+    if backend.name == 'float':
+        return np.asarray([float(x) for x in values], dtype='<f8')
+    if backend.name == 'fraction':
+        values = [Fraction(x) for x in values]
+        if all(abs(x.numerator) <= _INT64_MAX and x.denominator <= _INT64_MAX for x in values):
+            return np.array([(x.numerator, x.denominator) for x in values], dtype=_RATIONAL)
+        strings = ['{}/{}'.format(x.numerator, x.denominator) for x in values]
+    else:
+        strings = [str(Decimal(x)) for x in values]
+    width = max([len(s) for s in strings] or [1])
+    return np.array(strings, dtype='S{}'.format(width))
+
+
+def _decode(array, backend):
+    # the stored entries back as numbers of the backend, only the ones asked for
+    if array.dtype == _RATIONAL:
+        return [Fraction(int(x['num']), int(x['den'])) for x in array]
+    if array.dtype.kind == 'S':
+        convert = Fraction if backend.name == 'fraction' else Decimal
+        return [convert(x.decode('ascii')) for x in array]
+    return [backend.convert(x) for x in array.tolist()]
+
+
+def _write(path, kind, backend, rows, dimension, coefficients, constants=None):
+    header = {'kind': kind, 'backend': backend.name, 'rows': rows,
+              'dimension': dimension, 'dtype': _dtype_descr(coefficients.dtype)}
+    if isinstance(backend, DecimalBackend):
+        header['prec'] = backend.prec
+    text = json.dumps(header, sort_keys=True).encode('ascii')
+    start = len(MAGIC) + _LENGTH.size
+    padding = -(start + len(text)) % ALIGNMENT
+    text += b' ' * padding
+
+    with open(path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(_LENGTH.pack(len(text)))
+        f.write(text)
+        coefficients.tofile(f)
+        if constants is not None:
+            constants.tofile(f)
+
+
+def _dtype_descr(dtype):
+    if dtype.names:
+        return [list(field) for field in dtype.descr]
+    return dtype.str
+
+
+def save_system(path, system, kind='system'):
+    # a LinearSystem (dense or sparse) in the format above, in its own backend
+    rows = system._dense_snapshot()._rows
+    n = system.dimension
+    # encoded together so both parts get the same dtype
+    entries = _encode([x for row in rows for x in row[:-1]] + [row[-1] for row in rows],
+                      system.backend)
+    _write(path, kind, system.backend, len(rows), n, entries[:len(rows) * n], entries[len(rows) * n:])
+
+
+def save_planes(path, planes, backend=None):
+    # a list of Line / Plane / Hyperplane objects of one dimension
+    from linsys import LinearSystem
+    save_system(path, LinearSystem(list(planes), backend), 'planes')
+
+
+def save_vectors(path, vectors, backend=None):
+    # a list of Vectors or a VectorArray (always float64)
+    from vectorarray import VectorArray
+    if isinstance(vectors, VectorArray):
+        backend = get_backend('float')
+        coefficients = vectors.coordinates.astype('<f8')
+        _write(path, 'vectors', backend, len(vectors), vectors.dimension, coefficients.ravel())
+        return
+    vectors = list(vectors)
+    if backend is None:
+        backend = vectors[0].backend if vectors else None
+    backend = get_backend(backend)
+    dimension = vectors[0].dimension if vectors else 0
+    for v in vectors:
+        if v.dimension != dimension:
+            raise ValueError('All the vectors should have the same dimension')
+    coefficients = _encode([x for v in vectors for x in v.coordinates], backend)
+    _write(path, 'vectors', backend, len(vectors), dimension, coefficients)
+
+
+def _read_header(path):
+    with open(path, 'rb') as f:
+        magic = f.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError('{} is not a linear algebra file'.format(path))
+        length, = _LENGTH.unpack(f.read(_LENGTH.size))
+        header = json.loads(f.read(length).decode('ascii'))
+    dtype = header['dtype']
+    if isinstance(dtype, list):
+        dtype = [tuple(str(x) for x in field) for field in dtype]
+    header['dtype'] = np.dtype(dtype)
+    header['offset'] = len(MAGIC) + _LENGTH.size + length
+    return header
+
+
+def load(path):
+    # StoredSystem for "system" and "planes" files, StoredVectors for
+    # "vectors", both on top of read only memory maps of the file
+    header = _read_header(path)
+    if header['kind'] == 'vectors':
+        return StoredVectors(path, header)
+    return StoredSystem(path, header)
+
+
+class _Stored(object):
+
+    def __init__(self, path, header):
+        self.path = path
+        self.kind = header['kind']
+        self.dimension = header['dimension']
+        if header['backend'] == 'decimal':
+            self.backend = DecimalBackend(header.get('prec', 30))
+        else:
+            self.backend = get_backend(header['backend'])
+        self._num_rows = header['rows']
+        self._dtype = header['dtype']
+        self._offset = header['offset']
+
+    def _map(self, shape, offset=0):
+        if not np.prod(shape):
+            return np.empty(shape, dtype=self._dtype)
+        return np.memmap(self.path, dtype=self._dtype, mode='r',
+                         offset=self._offset + offset, shape=shape)
+
+    def __len__(self):
+        return self._num_rows
+
+    def float_coordinates(self, array):
+        # float64 view without a copy when the file is float64 already
+        if array.dtype == np.dtype('<f8'):
+            return array
+        if array.dtype == _RATIONAL:
+            return array['num'] / array['den'].astype(np.float64)
+        return np.array([float(x) for x in _decode(array.ravel(), self.backend)]).reshape(array.shape)
+
+
+class StoredSystem(_Stored):
+
+    # the coefficients (m x n) and constants (m) of a stored system as
+    # memory maps, planes are only made when they are asked for
+
+    def __init__(self, path, header):
+        super(StoredSystem, self).__init__(path, header)
+        m, n = self._num_rows, self.dimension
+        self.coefficients = self._map((m, n))
+        self.constants = self._map((m,), m * n * self._dtype.itemsize)
+
+    def row(self, i):
+        # [a_1, ..., a_n, k] of equation i in the backend's numbers
+        row = _decode(self.coefficients[i], self.backend)
+        row.append(_decode(self.constants[i:i+1], self.backend)[0])
+        return row
+
+    def __getitem__(self, i):
+        from linsys import make_hyperplane
+        row = self.row(i)
+        return make_hyperplane(Vector(row[:-1], self.backend), row[-1], self.backend)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def to_system(self, sparse=False):
+        # a LinearSystem (or SparseLinearSystem) with every row converted
+        from linsys import LinearSystem
+        rows = [self.row(i) for i in range(len(self))]
+        if sparse:
+            from sparse import SparseLinearSystem
+            return SparseLinearSystem.from_rows([r[:-1] for r in rows], [r[-1] for r in rows],
+                                                self.dimension, self.backend)
+        return LinearSystem._from_rows(rows, self.dimension, self.backend)
+
+    def float_coefficients(self):
+        return self.float_coordinates(self.coefficients)
+
+    def float_constants(self):
+        return self.float_coordinates(self.constants)
+
+    def to_plane_array(self, eps=FloatBackend.eps):
+        from planeset import PlaneArray
+        return PlaneArray(self.float_coefficients(), self.float_constants(), eps)
+
+    def to_line_array(self, eps=FloatBackend.eps):
+        from lineset import LineArray
+        return LineArray(self.float_coefficients(), self.float_constants(), eps)
+
+
+class StoredVectors(_Stored):
+
+    def __init__(self, path, header):
+        super(StoredVectors, self).__init__(path, header)
+        self.coordinates = self._map((self._num_rows, self.dimension))
+
+    def __getitem__(self, i):
+        return Vector(_decode(self.coordinates[i], self.backend), self.backend)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def to_vector_array(self):
+        from vectorarray import VectorArray
+        return VectorArray(self.float_coordinates(self.coordinates))
@@ -1,16 +1,26 @@
-from math import sqrt, acos, pi
-from decimal import Decimal, getcontext
+from math import acos, pi
+
+from numeric import get_backend
 
-getcontext().prec= 30
 
 class Vector(object):
-    def __init__(self, coordinates):
+
+    # Vectors are immutable, so the magnitude, the unit vector and is_zero()
+    # are computed the first time they are asked for and then kept. The cache
+    # slots stay empty until then (reading one raises AttributeError)
+    __slots__ = ('coordinates', 'dimension', 'backend',
+                 '_magnitude', '_unit', '_is_zero')
+
+    def __init__(self, coordinates, backend=None):
         try:
             if not coordinates:
                 raise ValueError
-            self.coordinates = tuple([Decimal(x) for x in coordinates])
+            backend = get_backend(backend)
+            convert = backend.convert
+            _set(self, 'backend', backend)
+            _set(self, 'coordinates', tuple([convert(x) for x in coordinates]))
 
-            self.dimension = len(coordinates)
+            _set(self, 'dimension', len(coordinates))
 
         except ValueError:
             raise ValueError('The coordinates must be nonempty')
@@ -25,8 +35,9 @@ class Vector(object):
         except ValueError:
             raise ValueError('Length is not equal')
             
-        new_coordinates= [x+y for x, y in zip(self.coordinates, v.coordinates)]
-        return Vector(new_coordinates)
+        with self.backend.local():
+            new_coordinates= [x+y for x, y in zip(self.coordinates, v.coordinates)]
+        return Vector(new_coordinates, self.backend)
 
     # vectore minus vector
     def minus(self, v):
@@ -36,31 +47,55 @@ class Vector(object):
         except ValueError:
             raise ValueError('Length is not equal')
             
-        new_coordinates= [x-y for x, y in zip(self.coordinates, v.coordinates)]
-        return Vector(new_coordinates)     
+        with self.backend.local():
+            new_coordinates= [x-y for x, y in zip(self.coordinates, v.coordinates)]
+        return Vector(new_coordinates, self.backend)     
 
     # vector time a constant
     def times_scalar(self, c):
-        new_coordinates= [Decimal(c)*x for x in self.coordinates]
-        return Vector(new_coordinates)
+        c= self.backend.convert(c)
+        with self.backend.local():
+            new_coordinates= [c*x for x in self.coordinates]
+        return Vector(new_coordinates, self.backend)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Vector is immutable')
+
+    def __reduce__(self):
+        # __slots__ and no __dict__, tell pickle how to build it again
+        return (Vector, (self.coordinates, self.backend))
 
     # calculate the magnitude of the vector    
     def magnitude(self):
-        coordinates_squared= [x**2 for x in self.coordinates]
-        return Decimal(sqrt(sum(coordinates_squared)))
-        # after sqrt(), type will become float
+        try:
+            return self._magnitude
+        except AttributeError:
+            with self.backend.local():
+                coordinates_squared= [x*x for x in self.coordinates]
+                m= self.backend.sqrt(sum(coordinates_squared))
+            _set(self, '_magnitude', m)
+            return m
  
     # normalize the vector
     def normalized(self):
         try:
-            temp= self.magnitude()
-            return self.times_scalar(Decimal('1.0')/self.magnitude())
+            return self._unit
+        except AttributeError:
+            pass
+        try:
+            with self.backend.local():
+                u= self.times_scalar(self.backend.one/self.magnitude())
         except ZeroDivisionError:
             raise ZeroDivisionError('Cannot normalize the zero vector')
+        # a unit vector is its own unit vector
+        _set(u, '_unit', u)
+        _set(self, '_unit', u)
+        return u
     
     # dot product (inner product)        
     def dot(self, v):
-        return sum([x*y for x, y in zip(self.coordinates, v.coordinates)])
+        with self.backend.local():
+            return sum([x*y for x, y in zip(self.coordinates, v.coordinates)])
 
     # calculate the angle between two vectors    
     def angle_with(self, v, in_degrees= False):
@@ -71,13 +106,11 @@ class Vector(object):
             # when calculate [1,1].angle_with([1,1]), something happens like acos(1.00000001)
             # and cause domain error, so I add the following code to deal the rounding error
             temp= u1.dot(u2)
-            if abs(temp) <= 1 + 1e-10:
-                if temp > 0:
-                    temp= 1
-                else:
-                    temp= -1
-            
-            
+            if temp > 1:
+                temp= 1
+            elif temp < -1:
+                temp= -1
+
             angle_in_radians= acos(temp)
             
             if in_degrees:
@@ -89,18 +122,36 @@ class Vector(object):
         # if zero vector, normalized will raise ZeroDivisionError
 
     # return the if the two vectors orthogonal to each other        
-    def is_orthogonal_to(self, v, tolerance= 1e-20):
-        return abs(self.dot(v)) < tolerance
+    # the default tolerance comes from the backend (1e-20 for Decimal prec=30)
+    def is_orthogonal_to(self, v, tolerance= None):
+        if tolerance is None:
+            tolerance= self.backend.orthogonal_eps
+        # through the backend, an exact backend has tolerance 0 (only 0 is zero)
+        return self.backend.is_near_zero(self.dot(v), tolerance)
     
     # return if the vector is zero vector (I didn't use tolerance)
     def is_zero(self):
-        return sum([abs(x) for x in self.coordinates]) == 0
+        try:
+            return self._is_zero
+        except AttributeError:
+            z= all(x == 0 for x in self.coordinates)
+            _set(self, '_is_zero', z)
+            return z
     
+    # the angle is 0 or pi when cos^2 is 1, (v.w)^2 = (v.v)(w.w) by
+    # Cauchy-Schwarz. No square roots, so it is exact with Fractions, and
+    # dividing by (v.v)(w.w) makes the tolerance independent of the magnitudes.
+    # The gap is -sin^2 of the angle, so it is held to orthogonal_eps (1e-20
+    # for Decimal, an angle of about 1e-10) like the dot product of
+    # is_orthogonal_to, not to eps
     def is_parallel_to(self, v):
-        return (self.is_zero() or
-                v.is_zero() or
-                self.angle_with(v) == 0 or
-                self.angle_with(v) == pi)
+        if self.is_zero() or v.is_zero():
+            return True
+        with self.backend.local():
+            vw= self.dot(v)
+            vv_ww= self.dot(self) * v.dot(v)
+            gap= (vw*vw - vv_ww) / vv_ww
+        return self.backend.is_near_zero(gap, self.backend.orthogonal_eps)
 
 
     def component_parallel_to(self, basis):
@@ -123,8 +174,9 @@ class Vector(object):
         try:
             a1, a2, a3= self.coordinates
             b1, b2, b3= v.coordinates
-            new_coordinates= [a2*b3 - a3*b2, a3*b1 - b3*a1, a1*b2 - b1*a2]
-            return Vector(new_coordinates)
+            with self.backend.local():
+                new_coordinates= [a2*b3 - a3*b2, a3*b1 - b3*a1, a1*b2 - b1*a2]
+            return Vector(new_coordinates, self.backend)
         except Exception as e:
             print str(e)
             print 'only support 3 dimensions vectors'
@@ -133,15 +185,22 @@ class Vector(object):
         return (self.cross(v)).magnitude()
     
     def area_of_triangle_with(self, v):
-        return self.area_of_parallelogram_with(v)/Decimal('2.0')
+        return self.area_of_parallelogram_with(v)/self.backend.convert(2)
         
     def __str__(self):
         return 'Vector: {}'.format(self.coordinates)
 
 
     def __eq__(self, v):
+        if not isinstance(v, Vector):
+            return False
         return self.coordinates == v.coordinates
 
-a= Vector(['1','1', '1'])
-b= Vector(['1','1'])
-a.angle_with(b)
+    def __ne__(self, v):
+        return not self.__eq__(v)
+
+    def __hash__(self):
+        return hash(self.coordinates)
+
+
+_set = object.__setattr__
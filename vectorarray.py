@@ -0,0 +1,172 @@
+from math import pi
+
+import numpy as np
+
+from vector import Vector
+from numeric import FloatBackend
+
+
+class VectorArray(object):
+
+    # a batch of N vectors of the same dimension, stored as one contiguous
+    # N x d float64 array. Every operation works on all rows at once, the
+    # other operand can be another VectorArray (same length), a single
+    # Vector or a VectorArray of length 1 (both are broadcast to every row)
+
+    LENGTH_NOT_EQUAL_MSG = 'Length is not equal'
+    ONLY_3D_CROSS_MSG = 'only support 3 dimensions vectors'
+
+    def __init__(self, coordinates):
+        try:
+            data = np.ascontiguousarray(coordinates, dtype=np.float64)
+            if data.ndim == 1:
+                data = data.reshape(1, -1)
+            if data.ndim != 2 or data.shape[1] == 0:
+                raise ValueError
+        except ValueError:
+            raise ValueError('The coordinates must be a nonempty N x d array')
+        except TypeError:
+            raise TypeError('The coordinates must be an iterable')
+
+        self.coordinates = data
+        self.dimension = data.shape[1]
+
+    @classmethod
+    def from_vectors(cls, vectors):
+        vectors = list(vectors)
+        if not vectors:
+            raise ValueError('The coordinates must be a nonempty N x d array')
+        d = vectors[0].dimension
+        data = np.empty((len(vectors), d), dtype=np.float64)
+        for i, v in enumerate(vectors):
+            if v.dimension != d:
+                raise ValueError(cls.LENGTH_NOT_EQUAL_MSG)
+            data[i] = v.coordinates
+        return cls(data)
+
+    def to_vectors(self, backend=None):
+        # repr() of a float gives the shortest string that round trips,
+        # so the Decimal coordinates are exactly the stored float64 values
+        return [Vector([repr(x) for x in row], backend) for row in self.coordinates.tolist()]
+
+    def _other(self, v):
+        # return the raw array of the other operand, ready to broadcast
+        if isinstance(v, VectorArray):
+            data = v.coordinates
+        elif isinstance(v, Vector):
+            data = np.array([float(x) for x in v.coordinates]).reshape(1, -1)
+        else:
+            data = np.asarray(v, dtype=np.float64)
+            if data.ndim == 1:
+                data = data.reshape(1, -1)
+
+        if data.shape[1] != self.dimension:
+            raise ValueError(self.LENGTH_NOT_EQUAL_MSG)
+        if data.shape[0] not in (1, len(self)):
+            raise ValueError(self.LENGTH_NOT_EQUAL_MSG)
+        return data
+
+    def plus(self, v):
+        return VectorArray(self.coordinates + self._other(v))
+
+    def minus(self, v):
+        return VectorArray(self.coordinates - self._other(v))
+
+    # c can be a scalar or one scalar per row
+    def times_scalar(self, c):
+        c = np.asarray(c, dtype=np.float64)
+        if c.ndim == 1:
+            c = c.reshape(-1, 1)
+        return VectorArray(self.coordinates * c)
+
+    # rowwise dot product, returns an array of length N
+    def dot(self, v):
+        return np.einsum('ij,ij->i', self.coordinates,
+                         np.broadcast_to(self._other(v), self.coordinates.shape))
+
+    def magnitude(self):
+        return np.sqrt(np.einsum('ij,ij->i', self.coordinates, self.coordinates))
+
+    def normalized(self):
+        m = self.magnitude()
+        if np.any(m == 0):
+            raise ZeroDivisionError('Cannot normalize the zero vector')
+        return VectorArray(self.coordinates / m[:, None])
+
+    def angle_with(self, v, in_degrees=False):
+        try:
+            u1 = self.normalized()
+            u2 = VectorArray(self._other(v)).normalized()
+        except ZeroDivisionError:
+            raise ZeroDivisionError('Cannot compute angle with zero vector')
+
+        # same rounding problem as Vector.angle_with, acos(1.00000001)
+        # is a domain error, so clip into [-1, 1]
+        temp = np.clip(u1.dot(u2), -1.0, 1.0)
+        angle_in_radians = np.arccos(temp)
+
+        if in_degrees:
+            return angle_in_radians * 180. / pi
+        return angle_in_radians
+
+    def is_zero(self):
+        return np.all(self.coordinates == 0, axis=1)
+
+    def component_parallel_to(self, basis):
+        try:
+            u = VectorArray(self._other(basis)).normalized()
+        except ZeroDivisionError:
+            raise ZeroDivisionError('Zero vector has no unique parallel component')
+        weights = self.dot(u)
+        return VectorArray(np.broadcast_to(u.coordinates, self.coordinates.shape) * weights[:, None])
+
+    def component_orthogonal_to(self, basis):
+        try:
+            projection = self.component_parallel_to(basis)
+        except ZeroDivisionError:
+            raise ZeroDivisionError('Zero vector has no unique orthogonal component')
+        return self.minus(projection)
+
+    def cross(self, v):
+        if self.dimension != 3:
+            raise ValueError(self.ONLY_3D_CROSS_MSG)
+        return VectorArray(np.cross(self.coordinates, self._other(v)))
+
+    def area_of_parallelogram_with(self, v):
+        return self.cross(v).magnitude()
+
+    def area_of_triangle_with(self, v):
+        return self.area_of_parallelogram_with(v) / 2.
+
+    def gram_schmidt(self, reorthogonalize=False, eps=FloatBackend.eps, block_size=64):
+        # orthonormal basis and R factor of all the rows, see orthogonal.py
+        from orthogonal import gram_schmidt
+        return gram_schmidt(self, reorthogonalize, eps, block_size)
+
+    def householder_qr(self, eps=FloatBackend.eps, block_size=32):
+        from orthogonal import householder_qr
+        return householder_qr(self, eps, block_size)
+
+    def __len__(self):
+        return self.coordinates.shape[0]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return VectorArray(self.coordinates[i])
+        return Vector([repr(x) for x in self.coordinates[i].tolist()])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __str__(self):
+        return 'VectorArray: {} vectors of dimension {}\n{}'.format(
+            len(self), self.dimension, self.coordinates)
+
+    def __eq__(self, v):
+        if not isinstance(v, VectorArray):
+            return False
+        return np.array_equal(self.coordinates, v.coordinates)
+
+    def __ne__(self, v):
+        return not self.__eq__(v)
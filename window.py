@@ -0,0 +1,182 @@
+from itertools import islice
+
+from lineset import LineArray, INTERSECTING, COINCIDENT
+from numeric import FloatBackend
+
+
+# Intersections of lines that fall inside an axis aligned window
+# (xmin, ymin, xmax, ymax), in O((n + k) log n) for k intersections instead of
+# checking all n^2 pairs.
+#
+# Clipped to the window every line is a chord: a segment with both ends on
+# the boundary. Because the window is convex, two chords cross inside it
+# exactly when their ends interleave along the boundary, s1 < s2 < e1 < e2.
+# So instead of a Bentley-Ottmann sweep over the plane (with its event queue
+# of crossings found on the way) we sweep once around the perimeter: a chord
+# is activated at its first end and finished at its second one, and when
+# a chord is finished, the active chords that started after it are exactly
+# the ones it crosses. Keeping the active chords in a linked list in start
+# order makes reporting O(1) per intersection, counting uses a Fenwick tree.
+# Positions closer than eps (FloatBackend.eps by default) count as equal and
+# the window is closed, lines meeting on the boundary are reported too.
+
+
+def _as_line_array(lines, eps):
+    if isinstance(lines, LineArray):
+        return lines
+    return LineArray.from_lines(lines, eps)
+
+
+def clip_to_window(lines, window, eps=FloatBackend.eps):
+    # returns {line index: (start, end)}, the perimeter positions of the ends
+    # of every line that meets the window, start <= end. The perimeter is
+    # walked counterclockwise from (xmin, ymin)
+    xmin, ymin, xmax, ymax = [float(x) for x in window]
+    if xmax < xmin or ymax < ymin:
+        raise ValueError('The window must be (xmin, ymin, xmax, ymax)')
+    width = xmax - xmin
+    height = ymax - ymin
+
+    def perimeter_position(x, y):
+        if abs(y - ymin) < eps:
+            return x - xmin
+        if abs(x - xmax) < eps:
+            return width + (y - ymin)
+        if abs(y - ymax) < eps:
+            return width + height + (xmax - x)
+        return 2*width + height + (ymax - y)
+
+    lines = _as_line_array(lines, eps)
+    basepoints = lines.basepoints()
+    chords = {}
+    for i in range(len(lines)):
+        a, b = lines.normals[i]
+        px, py = basepoints[i]
+        if px != px:
+            # zero normal vector, 0 = k is no line at all
+            continue
+
+        # Liang-Barsky: the line is p + t d with d = (-b, a), keep the
+        # t range inside each pair of window edges
+        t0, t1 = float('-inf'), float('inf')
+        inside = True
+        for p, d, low, high in ((px, -b, xmin, xmax), (py, a, ymin, ymax)):
+            if abs(d) < eps:
+                if p < low - eps or p > high + eps:
+                    inside = False
+                continue
+            ta = (low - p) / d
+            tb = (high - p) / d
+            if ta > tb:
+                ta, tb = tb, ta
+            t0 = max(t0, ta)
+            t1 = min(t1, tb)
+        if not inside or t0 > t1 + eps:
+            continue
+
+        s = perimeter_position(px - b*t0, py + a*t0)
+        e = perimeter_position(px - b*t1, py + a*t1)
+        if s > e:
+            s, e = e, s
+        chords[i] = (s, e)
+    return chords
+
+
+def _events(chords, eps):
+    # sweep order: by position (positions within eps are equal), starts
+    # before ends so touching chords meet, starts of equal position with
+    # the nearer end first and ends in start order
+    def q(x):
+        return int(round(x / eps)) if eps > 0 else x
+
+    starts = sorted(chords, key=lambda i: (q(chords[i][0]), q(chords[i][1]), i))
+    rank = dict((i, r) for r, i in enumerate(starts))
+    events = [(q(chords[i][0]), 0, rank[i], i) for i in starts]
+    events += [(q(chords[i][1]), 1, rank[i], i) for i in starts]
+    events.sort()
+    return events, rank
+
+
+def _crossing_pairs(chords, eps):
+    # yield (i, j) for every pair of crossing chords
+    events, rank = _events(chords, eps)
+    following = {}
+    preceding = {}
+    last = None
+    for position, kind, r, i in events:
+        if kind == 0:
+            # append to the active list, it is in start order
+            preceding[i] = last
+            following[i] = None
+            if last is not None:
+                following[last] = i
+            last = i
+        else:
+            j = following[i]
+            while j is not None:
+                yield i, j
+                j = following[j]
+            before, after = preceding.pop(i), following.pop(i)
+            if before is not None:
+                following[before] = after
+            if after is not None:
+                preceding[after] = before
+            else:
+                last = before
+
+
+def intersections_in_window(lines, window, eps=FloatBackend.eps, chunk_size=4096):
+    # yield (i, j, point) for every pair of lines that meet inside the window,
+    # i < j, point is (x, y), or None when the two are the same line. The
+    # points of chunk_size pairs at a time are found with LineArray
+    lines = _as_line_array(lines, eps)
+    chords = clip_to_window(lines, window, eps)
+    pairs = _crossing_pairs(chords, eps)
+    while True:
+        chunk = [(min(i, j), max(i, j)) for i, j in islice(pairs, chunk_size)]
+        if not chunk:
+            break
+        first = [i for i, j in chunk]
+        second = [j for i, j in chunk]
+        status, points = lines._classify(first, second)
+        for k, (i, j) in enumerate(chunk):
+            if status[k] == INTERSECTING:
+                yield i, j, (float(points[k, 0]), float(points[k, 1]))
+            elif status[k] == COINCIDENT:
+                yield i, j, None
+
+
+def count_intersections_in_window(lines, window, eps=FloatBackend.eps):
+    # only the number of crossing pairs, O(n log n) however many there are
+    lines = _as_line_array(lines, eps)
+    chords = clip_to_window(lines, window, eps)
+    events, rank = _events(chords, eps)
+
+    # Fenwick tree over start ranks of the active chords
+    tree = [0] * (len(rank) + 1)
+
+    def add(r, value):
+        r += 1
+        while r < len(tree):
+            tree[r] += value
+            r += r & -r
+
+    def prefix(r):
+        total = 0
+        while r > 0:
+            total += tree[r]
+            r -= r & -r
+        return total
+
+    active = 0
+    count = 0
+    for position, kind, r, i in events:
+        if kind == 0:
+            add(r, 1)
+            active += 1
+        else:
+            add(r, -1)
+            active -= 1
+            # active chords that started after this one
+            count += active - prefix(r)
+    return count